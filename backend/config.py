@@ -7,6 +7,9 @@ that required configuration is present.
 
 import os
 import logging
+from types import MappingProxyType
+from typing import Optional
+from urllib.parse import quote_plus, urlencode
 
 logger = logging.getLogger(__name__)
 
@@ -30,15 +33,50 @@ class EpicConfig:
     OAUTH_SCOPE_PATIENT = "openid fhirUser patient/Patient.read patient/Observation.read launch/patient"
     OAUTH_SCOPE_USER = "openid fhirUser user/Patient.read user/Observation.read"
     
+    # FHIR scopes each scope mode must include (checked in order for stable messages)
+    _REQUIRED_SCOPES = {
+        "patient": ("patient/Patient.read", "patient/Observation.read"),
+        "user": ("user/Patient.read", "user/Observation.read"),
+    }
+    
+    # Default Epic endpoints (used when the corresponding env var is unset)
+    _DEFAULT_REDIRECT_URI = "http://localhost:8000/callback"
+    _DEFAULT_AUTH_URL = "https://fhir.epic.com/interconnect-fhir-oauth/oauth2/authorize"
+    _DEFAULT_TOKEN_URL = "https://fhir.epic.com/interconnect-fhir-oauth/oauth2/token"
+    _DEFAULT_FHIR_BASE_URL = "https://fhir.epic.com/interconnect-fhir-oauth/api/FHIR/R4"
+    _DEFAULT_FRONTEND_URL = "http://localhost:3000"
+    
+    # Fixed attribute layout: no per-instance __dict__, and a typo'd
+    # assignment raises instead of silently adding an attribute
+    __slots__ = (
+        "env", "is_sandbox",
+        "client_id", "_client_id_source",
+        "redirect_uri", "auth_url", "token_url", "fhir_base_url",
+        "client_secret", "frontend_url",
+        "scope_mode", "_scope",
+        # Derived values computed at load
+        "_scope_parts", "_scope_set", "_fhir_scopes_present",
+        "_lowercased_urls", "_validation_error", "_config_errors",
+        "_authorize_query_head", "_authorize_query_tail",
+        "_computed_authorize_url", "_diagnostics",
+    )
+    
     def __init__(self):
         self._load_config()
     
+    def reload(self):
+        """Re-read configuration from the current environment."""
+        self._load_config()
+    
     def _load_config(self):
         """Load configuration from environment variables."""
+        # Env vars don't change mid-process - bind the lookup once
+        g = os.environ.get
+        
         # Determine environment: sandbox or prod
         # Check EPIC_ENV first, then fall back to SANDBOX_MODE for backwards compatibility
-        epic_env = os.getenv("EPIC_ENV", "").lower()
-        sandbox_mode = os.getenv("SANDBOX_MODE", "").lower() == "true"
+        epic_env = g("EPIC_ENV", "").lower()
+        sandbox_mode = g("SANDBOX_MODE", "").lower() == "true"
         
         if epic_env == "prod":
             self.env = "prod"
@@ -57,7 +95,7 @@ class EpicConfig:
         
         # Select client ID based on environment
         # Allow override via EPIC_CLIENT_ID for backwards compatibility
-        env_client_id = os.getenv("EPIC_CLIENT_ID")
+        env_client_id = g("EPIC_CLIENT_ID")
         
         if env_client_id and env_client_id != "your_client_id_from_epic_here":
             # Use explicitly provided client ID (backwards compatible)
@@ -65,26 +103,26 @@ class EpicConfig:
             self._client_id_source = "EPIC_CLIENT_ID env var"
         elif self.is_sandbox:
             # Use sandbox client ID (can be overridden via env)
-            self.client_id = os.getenv("EPIC_CLIENT_ID_SANDBOX", self.CLIENT_ID_SANDBOX)
+            self.client_id = g("EPIC_CLIENT_ID_SANDBOX", self.CLIENT_ID_SANDBOX)
             self._client_id_source = "sandbox (EPIC_CLIENT_ID_SANDBOX)"
         else:
             # Use production client ID (can be overridden via env)
-            self.client_id = os.getenv("EPIC_CLIENT_ID_PROD", self.CLIENT_ID_PROD)
+            self.client_id = g("EPIC_CLIENT_ID_PROD", self.CLIENT_ID_PROD)
             self._client_id_source = "production (EPIC_CLIENT_ID_PROD)"
         
         # Other Epic OAuth config
-        self.redirect_uri = os.getenv("EPIC_REDIRECT_URI", "http://localhost:8000/callback")
-        self.auth_url = os.getenv("EPIC_AUTH_URL", "https://fhir.epic.com/interconnect-fhir-oauth/oauth2/authorize")
-        self.token_url = os.getenv("EPIC_TOKEN_URL", "https://fhir.epic.com/interconnect-fhir-oauth/oauth2/token")
-        self.fhir_base_url = os.getenv("FHIR_BASE_URL", "https://fhir.epic.com/interconnect-fhir-oauth/api/FHIR/R4")
-        self.client_secret = os.getenv("EPIC_CLIENT_SECRET", "")
+        self.redirect_uri = g("EPIC_REDIRECT_URI", self._DEFAULT_REDIRECT_URI)
+        self.auth_url = g("EPIC_AUTH_URL", self._DEFAULT_AUTH_URL)
+        self.token_url = g("EPIC_TOKEN_URL", self._DEFAULT_TOKEN_URL)
+        self.fhir_base_url = g("FHIR_BASE_URL", self._DEFAULT_FHIR_BASE_URL)
+        self.client_secret = g("EPIC_CLIENT_SECRET", "")
         
         # Frontend URL for redirects after OAuth
-        self.frontend_url = os.getenv("FRONTEND_URL", "http://localhost:3000")
+        self.frontend_url = g("FRONTEND_URL", self._DEFAULT_FRONTEND_URL)
         
         # Scope mode: "patient" or "user"
         # Default to "user" for clinician workflow (avoids 403 on Patient.read)
-        self.scope_mode = os.getenv("EPIC_SCOPE_MODE", "user").lower()
+        self.scope_mode = g("EPIC_SCOPE_MODE", "user").lower()
         if self.scope_mode not in ("patient", "user"):
             logger.warning(f"Invalid EPIC_SCOPE_MODE '{self.scope_mode}', defaulting to 'user'")
             self.scope_mode = "user"
@@ -94,56 +132,84 @@ class EpicConfig:
             self._scope = self.OAUTH_SCOPE_USER
         else:
             self._scope = self.OAUTH_SCOPE_PATIENT
+        
+        # Config is immutable after load - precompute derived values once
+        self._scope_parts = self._scope.split()
+        self._scope_set = frozenset(self._scope_parts)
+        self._fhir_scopes_present = any(s.startswith(("patient/", "user/")) for s in self._scope_set)
+        self._lowercased_urls = {
+            "authorize_url": self.auth_url.lower(),
+            "token_url": self.token_url.lower(),
+            "fhir_base_url": self.fhir_base_url.lower(),
+        }
+        self._validation_error = self._compute_validation_error()
+        self._config_errors = tuple(self._compute_config_errors())
+        # Static authorize params, encoded once; only state (and launch) vary
+        self._authorize_query_head = urlencode({
+            "response_type": "code",
+            "client_id": self.client_id,
+            "redirect_uri": self.get_normalize_redirect_uri(),
+            "scope": self._scope,
+        })
+        self._authorize_query_tail = urlencode({"aud": self.fhir_base_url})
+        self._computed_authorize_url = self.build_authorize_url()
+        self._diagnostics = MappingProxyType(self._compute_diagnostics())
     
     def validate(self) -> bool:
         """
         Validate that required configuration is present and URLs are correct.
         
+        The check itself runs once at config load; this only re-raises its result.
+        
         Returns:
             True if valid, raises ValueError if not.
         """
+        if self._validation_error:
+            raise ValueError(self._validation_error)
+        return True
+    
+    def _compute_validation_error(self) -> Optional[str]:
+        """Return the first blocking config problem, or None if the config is usable."""
         if not self.client_id:
-            raise ValueError(
+            return (
                 "Epic Client ID not configured. "
                 "Set EPIC_ENV=sandbox or EPIC_ENV=prod, "
                 "or provide EPIC_CLIENT_ID directly."
             )
         
         if not self.auth_url:
-            raise ValueError("EPIC_AUTH_URL must be configured")
+            return "EPIC_AUTH_URL must be configured"
         
         if not self.token_url:
-            raise ValueError("EPIC_TOKEN_URL must be configured")
+            return "EPIC_TOKEN_URL must be configured"
         
         # Validate URLs are NOT MyChart URLs (common mistake)
         for name, url in [("auth_url", self.auth_url), ("token_url", self.token_url), ("fhir_base_url", self.fhir_base_url)]:
             if "mychart" in url.lower():
-                raise ValueError(
+                return (
                     f"{name} contains 'mychart' which is incorrect for SMART on FHIR. "
                     f"Current value: {url}. "
                     f"Use the FHIR server URLs (e.g., fhir.epic.com/interconnect-fhir-oauth/...)"
                 )
         
-        # Validate auth_url ends with /authorize
-        if not self.auth_url.endswith("/authorize"):
-            logger.warning(f"EPIC_AUTH_URL should end with /oauth2/authorize. Current: {self.auth_url}")
-        
-        # Validate token_url ends with /token
-        if not self.token_url.endswith("/token"):
-            logger.warning(f"EPIC_TOKEN_URL should end with /oauth2/token. Current: {self.token_url}")
-        
-        return True
+        # authorize/token URL suffix problems are non-fatal; they are reported
+        # through get_config_errors() (logged by log_config at startup)
+        return None
     
-    def get_config_errors(self) -> list:
+    def get_config_errors(self) -> tuple:
         """
         Comprehensive config mismatch detector.
-        Returns list of ERROR/WARNING strings.
+        Returns ERROR/WARNING strings (computed once at config load).
         """
+        return self._config_errors
+    
+    def _compute_config_errors(self) -> list:
+        """Build the list of ERROR/WARNING strings for the loaded config."""
         errors = []
         
         # ERROR: MyChart URLs detected
-        for name, url in [("authorize_url", self.auth_url), ("token_url", self.token_url), ("fhir_base_url", self.fhir_base_url)]:
-            if "mychart" in url.lower():
+        for name, url_lower in self._lowercased_urls.items():
+            if "mychart" in url_lower:
                 errors.append(f"ERROR: {name} contains 'mychart' - this is WRONG for SMART on FHIR!")
         
         # ERROR: Auth URL format
@@ -159,24 +225,13 @@ class EpicConfig:
             errors.append(f"WARNING: fhir_base_url should contain /api/FHIR/. Current: {self.fhir_base_url}")
         
         # ERROR: Scope missing FHIR scopes (only has openid/fhirUser)
-        scope_parts = self.scope.split()
-        fhir_scopes = [s for s in scope_parts if s.startswith("patient/") or s.startswith("user/")]
-        if not fhir_scopes:
+        if not self._fhir_scopes_present:
             errors.append(f"ERROR: Scope missing FHIR scopes! Only has: {self.scope}")
         
-        # ERROR: Patient mode but no patient/* scopes
-        if self.scope_mode == "patient":
-            if "patient/Patient.read" not in self.scope:
-                errors.append(f"ERROR: EPIC_SCOPE_MODE=patient but scope missing 'patient/Patient.read'")
-            if "patient/Observation.read" not in self.scope:
-                errors.append(f"ERROR: EPIC_SCOPE_MODE=patient but scope missing 'patient/Observation.read'")
-        
-        # ERROR: User mode but no user/* scopes  
-        if self.scope_mode == "user":
-            if "user/Patient.read" not in self.scope:
-                errors.append(f"ERROR: EPIC_SCOPE_MODE=user but scope missing 'user/Patient.read'")
-            if "user/Observation.read" not in self.scope:
-                errors.append(f"ERROR: EPIC_SCOPE_MODE=user but scope missing 'user/Observation.read'")
+        # ERROR: Selected scope mode but matching patient/* or user/* scopes missing
+        for required in self._REQUIRED_SCOPES.get(self.scope_mode, ()):
+            if required not in self._scope_set:
+                errors.append(f"ERROR: EPIC_SCOPE_MODE={self.scope_mode} but scope missing '{required}'")
         
         # WARNING: redirect_uri issues
         if "127.0.0.1" in self.redirect_uri and "localhost" in self.auth_url:
@@ -186,7 +241,7 @@ class EpicConfig:
         
         return errors
     
-    def get_url_warnings(self) -> list:
+    def get_url_warnings(self) -> tuple:
         """Alias for backwards compatibility."""
         return self.get_config_errors()
     
@@ -255,7 +310,8 @@ class EpicConfig:
         Returns:
             Full authorize URL string
         """
-        from urllib.parse import urlencode
+        if not iss:
+            return self.authorize_url_for(state)
         
         params = {
             "response_type": "code",
@@ -263,20 +319,40 @@ class EpicConfig:
             "redirect_uri": self.get_normalize_redirect_uri(),
             "scope": self.scope,
             "state": state,
-            "aud": iss or self.fhir_base_url,
+            "aud": iss,
         }
         
         query = urlencode(params)
         return f"{self.auth_url}?{query}"
     
-    def get_diagnostics(self) -> dict:
+    def authorize_url_for(self, state: str, launch: str = None) -> str:
+        """
+        Build the authorize URL for a launch request.
+        
+        Only state (and the EHR launch token) are encoded per call; the static
+        params were encoded at config load. Produces the same URL as
+        urlencode over the full param dict.
+        """
+        url = f"{self.auth_url}?{self._authorize_query_head}&state={quote_plus(state)}&{self._authorize_query_tail}"
+        if launch:
+            url += f"&launch={quote_plus(launch)}"
+        return url
+    
+    def get_diagnostics(self) -> MappingProxyType:
         """
         Return diagnostic information for debugging OAuth issues.
         
         Returns:
-            Dict with all relevant OAuth parameters and validation results
+            Read-only mapping (nested mappings and sequences included) with
+            all relevant OAuth parameters and validation results, shared
+            across calls (computed at config load). Copy with dict(...)
+            before adding request-specific keys.
         """
-        config_errors = self.get_config_errors()
+        return self._diagnostics
+    
+    def _compute_diagnostics(self) -> dict:
+        """Build the diagnostics dict for the loaded config (nested mappings read-only, lists as tuples)."""
+        config_errors = self._config_errors
         has_errors = any(e.startswith("ERROR") for e in config_errors)
         
         return {
@@ -298,32 +374,32 @@ class EpicConfig:
             
             # Scope
             "scope": self.scope,
-            "scope_parts": self.scope.split(),
+            "scope_parts": tuple(self._scope_parts),
             
             # Computed full authorize URL (copy/pasteable)
-            "computed_authorize_url": self.build_authorize_url(),
+            "computed_authorize_url": self._computed_authorize_url,
             
             # Validation
             "config_errors": config_errors,
             "has_errors": has_errors,
             
             # Breakdown of authorize URL params
-            "authorize_params": {
+            "authorize_params": MappingProxyType({
                 "response_type": "code",
                 "client_id": self.client_id,
                 "redirect_uri": self.get_normalize_redirect_uri(),
                 "scope": self.scope,
                 "state": "<generated_at_runtime>",
                 "aud": self.fhir_base_url,
-            },
+            }),
             
             # Verification assertions
-            "assertions": {
+            "assertions": MappingProxyType({
                 "aud_equals_fhir_base_url": True,  # By design
-                "scope_has_fhir_scopes": any(s.startswith("patient/") or s.startswith("user/") for s in self.scope.split()),
-                "authorize_url_is_interconnect": "interconnect" in self.auth_url.lower(),
-                "no_mychart_urls": not any("mychart" in url.lower() for url in [self.auth_url, self.token_url, self.fhir_base_url]),
-            }
+                "scope_has_fhir_scopes": self._fhir_scopes_present,
+                "authorize_url_is_interconnect": "interconnect" in self._lowercased_urls["authorize_url"],
+                "no_mychart_urls": not any("mychart" in url for url in self._lowercased_urls.values()),
+            })
         }
 
 
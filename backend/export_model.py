@@ -7,25 +7,18 @@ PE_Complete_Discovery_to_Interpretable notebook for use in the SMART on FHIR int
 Based on specifications from TECHNICAL_METHODS.md and COMPREHENSIVE_RESULTS_REPORT.md.
 """
 
-import pandas as pd
-import numpy as np
-import pickle
 import json
 from pathlib import Path
-from sklearn.linear_model import LogisticRegression
-from sklearn.impute import SimpleImputer
-from sklearn.preprocessing import OneHotEncoder
-from sklearn.compose import ColumnTransformer
-from sklearn.pipeline import Pipeline
-from sklearn.model_selection import train_test_split
 import logging
 
+# pandas / numpy / sklearn / joblib are imported inside the functions that
+# need them so importing this module (e.g. for FEATURE_NAMES) stays cheap
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Model configuration from documentation
 RANDOM_STATE = 42
-np.random.seed(RANDOM_STATE)
 
 # 25 features as specified in COMPREHENSIVE_RESULTS_REPORT.md
 FEATURE_NAMES = [
@@ -42,11 +35,36 @@ CATEGORICAL_FEATURES = ["gender"]
 NUMERIC_FEATURES = [f for f in FEATURE_NAMES if f not in CATEGORICAL_FEATURES]
 
 
+def impute_numeric(X: "pd.DataFrame", medians: "np.ndarray") -> "np.ndarray":
+    """
+    Median-impute NUMERIC_FEATURES in a single vectorized pass.
+    
+    Equivalent to the fitted SimpleImputer(strategy='median') step when
+    `medians` is its statistics_ (training rejects all-NaN columns).
+    """
+    import numpy as np
+    
+    num = X[NUMERIC_FEATURES].to_numpy(dtype=np.float64)
+    return np.where(np.isnan(num), medians, num)
+
+
 def train_and_export_model():
     """
     Train the logistic regression model as specified in the documentation
     and export it for deployment.
     """
+    import pandas as pd
+    import numpy as np
+    import joblib
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.impute import SimpleImputer
+    from sklearn.preprocessing import OneHotEncoder
+    from sklearn.compose import ColumnTransformer
+    from sklearn.pipeline import Pipeline
+    from sklearn.model_selection import train_test_split
+    
+    np.random.seed(RANDOM_STATE)
+    
     logger.info("=" * 80)
     logger.info("PE Rule-Out Model Export")
     logger.info("=" * 80)
@@ -112,9 +130,27 @@ def train_and_export_model():
         ('cat', categorical_transformer, CATEGORICAL_FEATURES)
     ], remainder='drop')
     
-    # Fit preprocessor
+    # Fit preprocessor (exported for sklearn consumers)
     logger.info("Fitting preprocessor...")
-    X_trainval_processed = preprocessor.fit_transform(X_trainval)
+    preprocessor.fit(X_trainval)
+    
+    # Numeric imputation as one NumPy pass with the fitted imputer's medians,
+    # so serving can reproduce it without the ColumnTransformer
+    medians = preprocessor.named_transformers_['num'].named_steps['imputer'].statistics_
+    empty = [name for name, m in zip(NUMERIC_FEATURES, medians) if np.isnan(m)]
+    if empty:
+        # SimpleImputer drops all-NaN columns, which would desync the exported
+        # medians and coefficients from the preprocessor's output
+        raise ValueError(f"Numeric features with no training values: {empty}")
+    onehot_step = preprocessor.named_transformers_['cat']
+    
+    def transform(X_part: "pd.DataFrame") -> "np.ndarray":
+        return np.hstack([
+            impute_numeric(X_part, medians),
+            onehot_step.transform(X_part[CATEGORICAL_FEATURES])
+        ])
+    
+    X_trainval_processed = transform(X_trainval)
     
     # Train logistic regression
     # Hyperparameters from TECHNICAL_METHODS.md Appendix A
@@ -131,7 +167,7 @@ def train_and_export_model():
     model.fit(X_trainval_processed, y_trainval)
     
     # Evaluate on test set
-    X_test_processed = preprocessor.transform(X_test)
+    X_test_processed = transform(X_test)
     y_pred_proba = model.predict_proba(X_test_processed)[:, 1]
     
     # Apply 0.08 threshold
@@ -168,22 +204,54 @@ def train_and_export_model():
     
     # Save model
     model_path = output_dir / "pe_lr_model.pkl"
-    with open(model_path, "wb") as f:
-        pickle.dump(model, f)
+    joblib.dump(model, model_path, compress=3)
     logger.info(f"✓ Model saved to {model_path}")
     
     # Save preprocessor
     preprocessor_path = output_dir / "pe_lr_preprocessor.pkl"
-    with open(preprocessor_path, "wb") as f:
-        pickle.dump(preprocessor, f)
+    joblib.dump(preprocessor, preprocessor_path, compress=3)
     logger.info(f"✓ Preprocessor saved to {preprocessor_path}")
     
+    # Save raw coefficients so inference can be a single dot product + sigmoid:
+    #   p = 1 / (1 + exp(-(X @ coef.T + intercept)))
+    # on the imputed/one-hot encoded float32 feature vector.
+    onehot = preprocessor.named_transformers_['cat'].named_steps['onehot']
+    coef32 = model.coef_.astype(np.float32)
+    intercept32 = model.intercept_.astype(np.float32)
+    
+    # Symmetric per-row int8 quantization. Dequantize with
+    #   X @ (coef_q.T * coef_scale) + intercept
+    # Per-weight error is at most coef_scale / 2.
+    coef_scale = np.abs(coef32).max(axis=1) / 127.0
+    coef_scale[coef_scale == 0] = 1.0
+    coef_q = np.round(coef32 / coef_scale[:, None]).astype(np.int8)
+    
+    X_test_f32 = X_test_processed.astype(np.float32)
+    p_f32 = 1 / (1 + np.exp(-(X_test_f32 @ coef32.T + intercept32)))
+    p_q = 1 / (1 + np.exp(-(X_test_f32 @ (coef_q.T.astype(np.float32) * coef_scale) + intercept32)))
+    logger.info(f"int8 quantization: max weight error {float(coef_scale.max()) / 2:.2e}, "
+                f"max probability error on test set {float(np.abs(p_f32 - p_q).max()):.2e}")
+    
+    coefs_path = output_dir / "pe_lr_coefs.npz"
+    np.savez_compressed(
+        coefs_path,
+        coef=coef32,
+        intercept=intercept32,
+        coef_q=coef_q,
+        coef_scale=coef_scale.astype(np.float32),
+        medians=medians.astype(np.float32),
+        categories=np.asarray(onehot.categories_[0], dtype=str),
+        feature_names_out=np.asarray(preprocessor.get_feature_names_out(), dtype=str),
+    )
+    logger.info(f"✓ Coefficients saved to {coefs_path}")
+    
     # Save feature metadata
     features_meta = {
         "features": FEATURE_NAMES,
         "order": FEATURE_NAMES,
         "numeric_features": NUMERIC_FEATURES,
         "categorical_features": CATEGORICAL_FEATURES,
+        "numeric_medians": dict(zip(NUMERIC_FEATURES, medians.tolist())),
         "threshold": threshold,
         "performance": {
             "auc": float(auc),
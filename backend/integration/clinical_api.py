@@ -5,11 +5,22 @@ These endpoints provide anticoagulation status, diagnoses, vitals, labs,
 and imaging data for the PE Rule-Out dashboard.
 """
 
-from datetime import datetime, timedelta
-from typing import Dict, Any, List, Optional
+import asyncio
+import base64
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from operator import itemgetter
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
 import logging
+import time
+
 import httpx
+import numpy as np
+import orjson
+from cachetools import TTLCache
 
+from .http_client import get_http_client
 from .clinical_mappings import (
     classify_medication,
     is_anticoagulant,
@@ -28,98 +39,230 @@ logger = logging.getLogger(__name__)
 # In-memory cache (per patient, 5 minute TTL)
 # ============================================================================
 
-_clinical_cache: Dict[str, Dict[str, Any]] = {}
 CACHE_TTL_SECONDS = 300  # 5 minutes
+CACHE_MAX_ENTRIES = 10_000
+# Raw laboratory bundles are much larger than the per-endpoint results
+LAB_CACHE_MAX_ENTRIES = 500
+
+CacheKey = Tuple[str, str]  # (patient_id, endpoint)
+
+# Expiry uses time.monotonic (no datetime allocation, immune to wall-clock
+# jumps); entries beyond maxsize are evicted LRU. All access is synchronous,
+# so no lock is needed under asyncio.
+_clinical_cache: TTLCache = TTLCache(
+    maxsize=CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, timer=time.monotonic
+)
+_lab_cache: TTLCache = TTLCache(
+    maxsize=LAB_CACHE_MAX_ENTRIES, ttl=CACHE_TTL_SECONDS, timer=time.monotonic
+)
 
 
-def _cache_key(patient_id: str, endpoint: str) -> str:
-    return f"{patient_id}:{endpoint}"
+def _cache_key(patient_id: str, endpoint: str) -> CacheKey:
+    return (patient_id, endpoint)
 
 
 def _get_cached(patient_id: str, endpoint: str) -> Optional[Dict]:
-    key = _cache_key(patient_id, endpoint)
-    if key in _clinical_cache:
-        entry = _clinical_cache[key]
-        if datetime.now().timestamp() < entry["expires_at"]:
-            logger.debug(f"Cache HIT: {key}")
-            return entry["data"]
-        else:
-            del _clinical_cache[key]
-    return None
+    return _clinical_cache.get((patient_id, endpoint))
 
 
 def _set_cache(patient_id: str, endpoint: str, data: Dict):
-    key = _cache_key(patient_id, endpoint)
-    _clinical_cache[key] = {
-        "data": data,
-        "expires_at": datetime.now().timestamp() + CACHE_TTL_SECONDS
-    }
-    logger.debug(f"Cache SET: {key}")
+    _clinical_cache[(patient_id, endpoint)] = data
+    logger.debug(f"Cache SET: {patient_id}:{endpoint}")
 
 
 def clear_cache(patient_id: Optional[str] = None):
     """Clear cache for a patient or all patients."""
-    global _clinical_cache
-    if patient_id:
-        keys_to_delete = [k for k in _clinical_cache if k.startswith(f"{patient_id}:")]
-        for k in keys_to_delete:
-            del _clinical_cache[k]
-    else:
-        _clinical_cache = {}
+    for cache in (_clinical_cache, _lab_cache, _vitals_delta_base):
+        if patient_id:
+            for k in [k for k in list(cache.keys()) if k[0] == patient_id]:
+                cache.pop(k, None)
+        else:
+            cache.clear()
+
+
+# ============================================================================
+# Date cutoffs (memoized per calendar day)
+# ============================================================================
+
+_cutoff_day: Optional[int] = None  # date.toordinal() of the memoized day
+_cutoff_cache: Dict[int, str] = {}
+
+
+def _days_ago_str(days: int) -> str:
+    """Return today minus N days as YYYY-MM-DD, reformatting only when the day changes."""
+    global _cutoff_day
+    today = date.today().toordinal()
+    if today != _cutoff_day:
+        _cutoff_cache.clear()
+        _cutoff_day = today
+    cutoff = _cutoff_cache.get(days)
+    if cutoff is None:
+        cutoff = date.fromordinal(today - days).isoformat()
+        _cutoff_cache[days] = cutoff
+    return cutoff
+
+
+def _one_year_ago_str() -> str:
+    return _days_ago_str(365)
+
+
+def _window_now() -> datetime:
+    """
+    Current time rounded down to the minute.
+    
+    Aggregators take this once and pass it to every section so concurrent
+    searches send byte-identical date filters within the same minute.
+    """
+    return datetime.now().replace(second=0, microsecond=0)
 
 
 # ============================================================================
 # FHIR Query Helpers
 # ============================================================================
 
-async def fhir_search(
-    fhir_base: str,
-    access_token: str,
+FHIR_MAX_PAGES = 10  # hard stop when following Bundle.link[next]
+
+
+@dataclass
+class FHIRSession:
+    """
+    Per-request FHIR context: base URL, auth headers and the shared client.
+    
+    Built once per clinical call so each search only does client.get.
+    debug_calls is None unless debug=True, so no URL strings are built.
+    """
+    base: str
+    headers: Dict[str, str]
+    client: httpx.AsyncClient
+    debug_calls: Optional[List[str]] = None
+    
+    @classmethod
+    def open(cls, fhir_base: str, access_token: str, debug: bool = False) -> "FHIRSession":
+        return cls(
+            base=fhir_base.rstrip("/"),
+            headers={
+                "Authorization": f"Bearer {access_token}",
+                "Accept": "application/fhir+json"
+            },
+            client=get_http_client(),
+            debug_calls=[] if debug else None
+        )
+
+
+async def fhir_search_iter(
+    session: FHIRSession,
     resource_type: str,
     params: Dict[str, str],
-    debug_calls: List[str]
-) -> List[Dict]:
+    max_pages: int = FHIR_MAX_PAGES
+) -> AsyncIterator[Dict]:
     """
-    Execute a FHIR search and return entries.
-    Appends the URL to debug_calls for transparency.
+    Execute a FHIR search and yield resources page by page.
+    
+    Follows Bundle.link[relation=next] (up to max_pages) so results beyond
+    the first page aren't dropped; callers can stop iterating early.
+    In debug mode, appends each URL (without token) to session.debug_calls.
     """
-    url = f"{fhir_base}/{resource_type}"
-    headers = {
-        "Authorization": f"Bearer {access_token}",
-        "Accept": "application/fhir+json"
-    }
+    url = f"{session.base}/{resource_type}"
+    query: Optional[Dict[str, str]] = params
     
-    async with httpx.AsyncClient() as client:
-        response = await client.get(url, headers=headers, params=params, timeout=15.0)
+    for _ in range(max_pages):
+        response = await session.client.get(url, headers=session.headers, params=query, timeout=15.0)
         
-        # Log the call (without token)
-        call_url = f"GET {resource_type}?" + "&".join(f"{k}={v}" for k, v in params.items())
-        debug_calls.append(call_url)
+        if session.debug_calls is not None:
+            if query is not None:
+                session.debug_calls.append(f"GET {resource_type}?{urlencode(query, safe=',')}")
+            else:
+                session.debug_calls.append(f"GET {url}")
         
         if response.status_code == 403:
             logger.warning(f"FHIR 403 Forbidden: {resource_type}")
-            return []
+            return
         
         if response.status_code == 404:
             logger.debug(f"FHIR 404: {resource_type} - no results")
-            return []
+            return
         
         response.raise_for_status()
-        bundle = response.json()
-    
-    entries = []
-    if bundle.get("entry"):
-        for entry in bundle["entry"]:
+        bundle = orjson.loads(response.content)
+        
+        for entry in bundle.get("entry") or ():
             if entry.get("resource"):
-                entries.append(entry["resource"])
+                yield entry["resource"]
+        
+        next_url = None
+        for link in bundle.get("link") or ():
+            if link.get("relation") == "next":
+                next_url = link.get("url")
+                break
+        if not next_url:
+            return
+        
+        # The next link is absolute and already carries the search params;
+        # never send the bearer token to a host other than the FHIR base
+        if not next_url.startswith((f"{session.base}/", f"{session.base}?")):
+            logger.warning(f"FHIR {resource_type}: ignoring next link outside the FHIR base")
+            return
+        url = next_url
+        query = None
     
-    return entries
+    logger.warning(f"FHIR {resource_type}: stopped paging after {max_pages} pages")
+
+
+async def fhir_search(
+    session: FHIRSession,
+    resource_type: str,
+    params: Dict[str, str],
+    max_pages: int = FHIR_MAX_PAGES
+) -> List[Dict]:
+    """
+    Execute a FHIR search and return all resources.
+    """
+    return [r async for r in fhir_search_iter(session, resource_type, params, max_pages)]
 
 
 # ============================================================================
 # Anticoagulation Status
 # ============================================================================
 
+def _parse_medication(med: Dict[str, Any]) -> Tuple[Optional[str], Optional[str], str, Optional[str]]:
+    """
+    Extract (name, rxnorm, status, start_date) from a MedicationRequest.
+    
+    Sub-dicts are bound to locals once, and medicationCodeableConcept.coding
+    is walked a single time for both the fallback display name and RxNorm.
+    """
+    get = med.get
+    concept = get("medicationCodeableConcept")
+    
+    med_name = None
+    rxnorm = None
+    if concept:
+        display = None
+        for coding in concept.get("coding") or ():
+            coding_get = coding.get
+            if display is None:
+                display = coding_get("display") or None
+            if rxnorm is None and coding_get("system", "").endswith("rxnorm"):
+                rxnorm = coding_get("code")
+            if display is not None and rxnorm is not None:
+                break
+        med_name = concept.get("text") or display
+    else:
+        reference = get("medicationReference")
+        if reference:
+            med_name = reference.get("display", "Unknown")
+    
+    authored_on = get("authoredOn")
+    start_date = authored_on[:10] if authored_on else None
+    
+    return med_name, rxnorm, get("status", "unknown"), start_date
+
+
+# Medication types that drive the anticoagulation status below
+ANTICOAGULANT_TYPES = frozenset(("DOAC", "Warfarin", "Heparin_LMWH"))
+MAX_ACTIVE_MEDS_PER_TYPE = 5
+
+
 async def get_anticoagulation_status(
     fhir_base: str,
     access_token: str,
@@ -135,33 +278,26 @@ async def get_anticoagulation_status(
     if cached:
         return cached
     
-    debug_calls = []
+    session = FHIRSession.open(fhir_base, access_token, debug)
     medications = []
     
     # Query MedicationRequest for last 1 year
-    one_year_ago = (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d")
+    one_year_ago = _one_year_ago_str()
+    
+    active_per_type = dict.fromkeys(ANTICOAGULANT_TYPES, 0)
     
     try:
-        med_requests = await fhir_search(
-            fhir_base, access_token, "MedicationRequest",
+        med_requests = fhir_search_iter(
+            session, "MedicationRequest",
             {
                 "patient": patient_id,
                 "authoredon": f"ge{one_year_ago}",
                 "_count": "100"
-            },
-            debug_calls
+            }
         )
         
-        for med in med_requests:
-            # Extract medication name
-            med_name = None
-            if med.get("medicationCodeableConcept"):
-                med_name = med["medicationCodeableConcept"].get("text", "")
-                if not med_name and med["medicationCodeableConcept"].get("coding"):
-                    med_name = med["medicationCodeableConcept"]["coding"][0].get("display", "")
-            elif med.get("medicationReference"):
-                med_name = med["medicationReference"].get("display", "Unknown")
-            
+        async for med in med_requests:
+            med_name, rxnorm, status, start_date = _parse_medication(med)
             if not med_name:
                 continue
             
@@ -170,22 +306,6 @@ async def get_anticoagulation_status(
             if med_type == "Other":
                 continue  # Only include anticoagulants/antiplatelets
             
-            # Extract status
-            status = med.get("status", "unknown")
-            
-            # Extract start date
-            start_date = None
-            if med.get("authoredOn"):
-                start_date = med["authoredOn"][:10]
-            
-            # Get RxNorm code if available
-            rxnorm = None
-            if med.get("medicationCodeableConcept", {}).get("coding"):
-                for coding in med["medicationCodeableConcept"]["coding"]:
-                    if coding.get("system", "").endswith("rxnorm"):
-                        rxnorm = coding.get("code")
-                        break
-            
             medications.append({
                 "name": med_name,
                 "rxnorm": rxnorm,
@@ -193,12 +313,18 @@ async def get_anticoagulation_status(
                 "start": start_date,
                 "status": status
             })
+            
+            # Stop paging once every anticoagulant type has enough active meds
+            if status == "active" and med_type in active_per_type:
+                active_per_type[med_type] += 1
+                if all(n >= MAX_ACTIVE_MEDS_PER_TYPE for n in active_per_type.values()):
+                    break
     
     except Exception as e:
         logger.error(f"Error fetching medications: {e}")
     
     # Determine overall status
-    active_anticoag = [m for m in medications if m["status"] == "active" and m["type"] in ["DOAC", "Warfarin", "Heparin_LMWH"]]
+    active_anticoag = [m for m in medications if m["status"] == "active" and m["type"] in ANTICOAGULANT_TYPES]
     has_warfarin = any(m["type"] == "Warfarin" for m in medications if m["status"] == "active")
     
     if active_anticoag:
@@ -215,12 +341,148 @@ async def get_anticoagulation_status(
     }
     
     if debug:
-        result["debug"] = {"fhir_calls": debug_calls}
+        result["debug"] = {"fhir_calls": session.debug_calls}
     
     _set_cache(patient_id, "anticoagulation", result)
     return result
 
 
+# ============================================================================
+# Resource field accessors
+# ============================================================================
+
+def _first_coding(resource: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Return resource.code.coding[0] in one traversal, or None."""
+    try:
+        return resource["code"]["coding"][0]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+def _vq(resource: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Return resource.valueQuantity if present and non-empty."""
+    return resource.get("valueQuantity") or None
+
+
+# ============================================================================
+# Lab helpers (INR / D-dimer)
+# ============================================================================
+
+# INR and D-dimer share one laboratory search round trip; each trend then
+# matches client-side by LOINC code or by code text
+_INR_CODES = frozenset(LAB_LOINC["inr"])
+_INR_TEXT = ("inr",)
+_DDIMER_CODES = frozenset(LAB_LOINC["ddimer"])
+_DDIMER_TEXT = ("d-dimer", "ddimer", "d dimer")
+_LAB_TREND_CODES = ",".join(LAB_LOINC["inr"] + LAB_LOINC["ddimer"])
+
+# The uncoded (category + text) search covers servers without LOINC coding;
+# the whole laboratory category can be large, so only recent pages are read
+LAB_TEXT_FALLBACK_MAX_PAGES = 2
+
+
+def _lab_search_params(patient_id: str, start_date: str, code: Optional[str] = None) -> Dict[str, str]:
+    params = {
+        "patient": patient_id,
+        "category": "laboratory",
+        "date": f"ge{start_date}",
+        "_count": "200",
+        "_sort": "-date"
+    }
+    if code:
+        params["code"] = code
+    return params
+
+
+def _drop_task(task: "asyncio.Future") -> None:
+    """Cancel a task whose result is no longer needed, retrieving any error it already raised."""
+    if not task.done():
+        task.cancel()
+    elif not task.cancelled():
+        task.exception()
+
+
+async def _search_trend_labs(session: "FHIRSession", patient_id: str, start_date: str) -> List[Dict]:
+    """
+    Run the LOINC-coded and the uncoded INR/D-dimer searches concurrently.
+    
+    Coded results win when there are any (the uncoded search is then
+    cancelled); otherwise the uncoded results are returned for text matching.
+    Either way it costs one round trip of latency.
+    """
+    uncoded = asyncio.ensure_future(fhir_search(
+        session, "Observation", _lab_search_params(patient_id, start_date),
+        max_pages=LAB_TEXT_FALLBACK_MAX_PAGES
+    ))
+    try:
+        labs = await fhir_search(
+            session, "Observation", _lab_search_params(patient_id, start_date, _LAB_TREND_CODES)
+        )
+    except BaseException:
+        _drop_task(uncoded)
+        raise
+    if labs:
+        _drop_task(uncoded)
+        return labs
+    return await uncoded
+
+
+# In-flight laboratory searches, so concurrent INR/D-dimer lookups for the
+# same patient (e.g. from the clinical bundle) share one FHIR request
+_lab_fetches_in_flight: Dict[CacheKey, "asyncio.Future[List[Dict]]"] = {}
+
+
+async def _fetch_labs_by_category(
+    session: "FHIRSession",
+    patient_id: str,
+    start_date: str
+) -> List[Dict]:
+    """
+    Fetch the patient's INR/D-dimer laboratory Observations since start_date once.
+    
+    Results are kept in their own smaller TTL cache; both lab trends filter
+    from the shared list.
+    """
+    key = _cache_key(patient_id, f"lab_trend_{start_date}")
+    cached = _lab_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    pending = _lab_fetches_in_flight.get(key)
+    if pending is not None:
+        return await asyncio.shield(pending)
+    
+    pending = asyncio.ensure_future(
+        _search_trend_labs(session, patient_id, start_date)
+    )
+    _lab_fetches_in_flight[key] = pending
+    try:
+        labs = await asyncio.shield(pending)
+    finally:
+        _lab_fetches_in_flight.pop(key, None)
+    
+    _lab_cache[key] = labs
+    return labs
+
+
+def _filter_lab_observations(
+    observations: List[Dict],
+    codes: frozenset,
+    text_terms: Tuple[str, ...]
+) -> List[Dict]:
+    """Keep observations whose coding hits `codes` or whose code.text contains a term."""
+    matched = []
+    for obs in observations:
+        code = obs.get("code") or {}
+        if any(c.get("code") in codes for c in code.get("coding") or ()):
+            matched.append(obs)
+            continue
+        text = (code.get("text") or "").lower()
+        if text and any(t in text for t in text_terms):
+            matched.append(obs)
+    return matched
+
+
 # ============================================================================
 # INR Trend
 # ============================================================================
@@ -242,63 +504,35 @@ async def get_inr_trend(
     if cached:
         return cached
     
-    debug_calls = []
+    session = FHIRSession.open(fhir_base, access_token, debug)
     series = []
     
-    start_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    start_date = _days_ago_str(days)
     
     try:
-        # Try LOINC codes first
-        inr_codes = ",".join(LAB_LOINC["inr"])
-        observations = await fhir_search(
-            fhir_base, access_token, "Observation",
-            {
-                "patient": patient_id,
-                "code": inr_codes,
-                "date": f"ge{start_date}",
-                "_count": "100",
-                "_sort": "-date"
-            },
-            debug_calls
+        observations = _filter_lab_observations(
+            await _fetch_labs_by_category(session, patient_id, start_date),
+            _INR_CODES, _INR_TEXT
         )
         
-        # Fallback: text search if no results
-        if not observations:
-            observations = await fhir_search(
-                fhir_base, access_token, "Observation",
-                {
-                    "patient": patient_id,
-                    "category": "laboratory",
-                    "date": f"ge{start_date}",
-                    "_count": "200",
-                    "_sort": "-date"
-                },
-                debug_calls
-            )
-            # Filter for INR
-            observations = [
-                o for o in observations
-                if "inr" in (o.get("code", {}).get("text", "") or "").lower()
-            ]
-        
+        series_append = series.append
         for obs in observations:
             time_str = obs.get("effectiveDateTime")
             if not time_str:
                 continue
             
-            value = None
-            unit = ""
-            if obs.get("valueQuantity"):
-                value = obs["valueQuantity"].get("value")
-                unit = obs["valueQuantity"].get("unit", "")
+            vq = _vq(obs)
+            if vq is None:
+                continue
+            value = vq.get("value")
             
             if value is not None:
+                unit = vq.get("unit", "")
                 # Get LOINC code
-                code = None
-                if obs.get("code", {}).get("coding"):
-                    code = obs["code"]["coding"][0].get("code")
+                coding = _first_coding(obs)
+                code = coding.get("code") if coding else None
                 
-                series.append({
+                series_append({
                     "time": time_str,
                     "value": value,
                     "unit": unit,
@@ -311,7 +545,7 @@ async def get_inr_trend(
     
     result = {"series": series}
     if debug:
-        result["debug"] = {"fhir_calls": debug_calls}
+        result["debug"] = {"fhir_calls": session.debug_calls}
     
     _set_cache(patient_id, cache_key, result)
     return result
@@ -338,52 +572,51 @@ async def get_diagnoses(
     if cached:
         return cached
     
-    debug_calls = []
+    session = FHIRSession.open(fhir_base, access_token, debug)
     conditions = []
     
-    start_date = (datetime.now() - timedelta(days=years * 365)).strftime("%Y-%m-%d")
+    start_date = _days_ago_str(years * 365)
     
     try:
         # Fetch conditions
         condition_resources = await fhir_search(
-            fhir_base, access_token, "Condition",
+            session, "Condition",
             {
                 "patient": patient_id,
                 "onset-date": f"ge{start_date}",
                 "_count": "100",
                 "_sort": "-onset-date"
-            },
-            debug_calls
+            }
         )
         
+        conditions_append = conditions.append
         for cond in condition_resources:
+            get = cond.get
+            
             # Extract display text
-            display = None
+            display = (get("code") or {}).get("text")
             code = None
-            if cond.get("code"):
-                display = cond["code"].get("text")
-                if cond["code"].get("coding"):
-                    coding = cond["code"]["coding"][0]
-                    if not display:
-                        display = coding.get("display")
-                    code = coding.get("code")
+            coding = _first_coding(cond)
+            if coding:
+                if not display:
+                    display = coding.get("display")
+                code = coding.get("code")
             
             if not display:
                 continue
             
             # Extract clinical status
             clinical_status = "unknown"
-            if cond.get("clinicalStatus", {}).get("coding"):
-                clinical_status = cond["clinicalStatus"]["coding"][0].get("code", "unknown")
+            status_coding = (get("clinicalStatus") or {}).get("coding")
+            if status_coding:
+                clinical_status = status_coding[0].get("code", "unknown")
             
             # Extract onset
-            onset = None
-            if cond.get("onsetDateTime"):
-                onset = cond["onsetDateTime"][:10]
-            elif cond.get("recordedDate"):
-                onset = cond["recordedDate"][:10]
+            onset = get("onsetDateTime") or get("recordedDate")
+            if onset:
+                onset = onset[:10]
             
-            conditions.append({
+            conditions_append({
                 "display": display,
                 "code": code,
                 "clinical_status": clinical_status,
@@ -405,7 +638,7 @@ async def get_diagnoses(
     }
     
     if debug:
-        result["debug"] = {"fhir_calls": debug_calls}
+        result["debug"] = {"fhir_calls": session.debug_calls}
     
     _set_cache(patient_id, cache_key, result)
     return result
@@ -415,111 +648,271 @@ async def get_diagnoses(
 # Vitals Trend
 # ============================================================================
 
+VITAL_SERIES = ("hr", "spo2", "rr", "sbp")
+VITALS_MAX_POINTS = 200
+
+# Raw (pre-downsampling) vitals plus the newest meta.lastUpdated seen, kept
+# longer than the response cache so refreshes only fetch deltas via
+# _lastUpdated. A full refetch happens once this expires, which also picks
+# up deleted/entered-in-error observations.
+VITALS_DELTA_TTL_SECONDS = 1800
+_vitals_delta_base: TTLCache = TTLCache(
+    maxsize=CACHE_MAX_ENTRIES, ttl=VITALS_DELTA_TTL_SECONDS, timer=time.monotonic
+)
+
+
+# Per vital type, parallel "time" / "value" / "id" lists (struct-of-arrays);
+# "id" is the source Observation id, used to merge deltas. Dicts for the
+# JSON response are only built for points that survive downsampling.
+VitalSeries = Dict[str, Dict[str, List[Any]]]
+
+
+def _empty_vital_series() -> VitalSeries:
+    return {vital_type: {"time": [], "value": [], "id": []} for vital_type in VITAL_SERIES}
+
+
+def _append_vital_point(
+    series: VitalSeries,
+    bucket_counts: Dict[str, int],
+    vital_type: str,
+    time_str: str,
+    value: Any,
+    obs_id: Optional[str]
+):
+    """Append a point, counting distinct 10-minute buckets (input is newest first)."""
+    buf = series[vital_type]
+    times = buf["time"]
+    # "YYYY-MM-DDTHH:M" - the first 15 characters identify the 10-minute bucket
+    if not times or times[-1][:15] != time_str[:15]:
+        bucket_counts[vital_type] += 1
+    times.append(time_str)
+    buf["value"].append(value)
+    buf["id"].append(obs_id)
+
+
+def _parse_vital_observations(
+    observations: List[Dict],
+    series: VitalSeries,
+    max_points: Optional[int] = None
+) -> Optional[str]:
+    """
+    Append vital-sign points to series; return the newest meta.lastUpdated.
+    
+    Observations arrive newest first (_sort=-date). With max_points set,
+    parsing stops once every series has 2 * max_points distinct 10-minute
+    buckets - more than downsampling would keep anyway.
+    """
+    last_updated = None
+    bucket_counts = {vital_type: 0 for vital_type in series}
+    cap = 2 * max_points if max_points else None
+    
+    for obs in observations:
+        if cap is not None and all(c >= cap for c in bucket_counts.values()):
+            break
+        
+        updated = (obs.get("meta") or {}).get("lastUpdated")
+        if updated and (last_updated is None or updated > last_updated):
+            last_updated = updated
+        
+        time_str = obs.get("effectiveDateTime")
+        if not time_str:
+            continue
+        
+        # Get codes
+        codes = []
+        display = ""
+        if obs.get("code"):
+            display = obs["code"].get("text", "")
+            if obs["code"].get("coding"):
+                codes = [c.get("code", "") for c in obs["code"]["coding"]]
+        
+        # Match vital type
+        vital_type = match_vital_type(codes, display)
+        if vital_type not in series:
+            continue
+        
+        # Extract value
+        value = None
+        vq = _vq(obs)
+        if vq is not None:
+            value = vq.get("value")
+        elif obs.get("component"):
+            # Handle BP components
+            for comp in obs["component"]:
+                comp_codes = [c.get("code", "") for c in comp.get("code", {}).get("coding", [])]
+                comp_display = comp.get("code", {}).get("text", "")
+                comp_type = match_vital_type(comp_codes, comp_display)
+                if comp_type in series and comp.get("valueQuantity"):
+                    _append_vital_point(series, bucket_counts, comp_type, time_str, comp["valueQuantity"]["value"], obs.get("id"))
+            continue
+        
+        if value is not None:
+            _append_vital_point(series, bucket_counts, vital_type, time_str, value, obs.get("id"))
+    
+    return last_updated
+
+
+def _parse_instant(value: str, default: datetime) -> datetime:
+    """
+    Parse a FHIR dateTime to an aware datetime; naive values are taken as
+    local time (like the search window), unparseable ones return default.
+    """
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        return default
+    return parsed if parsed.tzinfo else parsed.astimezone()
+
+
+def _merge_vital_series(
+    base: VitalSeries,
+    delta: VitalSeries,
+    window_start: datetime
+) -> VitalSeries:
+    """
+    Merge delta points into base (newest first), replacing base points from
+    Observations the delta returned again and dropping points that fell out
+    of the window. Distinct Observations sharing a timestamp are all kept.
+    
+    Timestamps are compared as instants, so "Z" and offset suffixes are
+    honoured; unparseable ones are kept and sorted last.
+    """
+    if window_start.tzinfo is None:
+        window_start = window_start.astimezone()
+    merged = _empty_vital_series()
+    for vital_type in VITAL_SERIES:
+        new, old = delta[vital_type], base[vital_type]
+        replaced = {obs_id for obs_id in new["id"] if obs_id is not None}
+        points = [
+            (_parse_instant(t, window_start), t, value, obs_id)
+            for t, value, obs_id in zip(new["time"], new["value"], new["id"])
+        ]
+        points.extend(
+            (_parse_instant(t, window_start), t, value, obs_id)
+            for t, value, obs_id in zip(old["time"], old["value"], old["id"])
+            if obs_id is None or obs_id not in replaced
+        )
+        # Stable sort keeps delta points ahead of base points at equal times
+        points.sort(key=itemgetter(0), reverse=True)
+        buf = merged[vital_type]
+        for instant, t, value, obs_id in points:
+            if instant < window_start:
+                break
+            buf["time"].append(t)
+            buf["value"].append(value)
+            buf["id"].append(obs_id)
+    return merged
+
+
 async def get_vitals_trend(
     fhir_base: str,
     access_token: str,
     patient_id: str,
     hours: int = 24,
-    debug: bool = False
+    debug: bool = False,
+    now: Optional[datetime] = None
 ) -> Dict[str, Any]:
     """
     GET /api/clinical/vitals
     
-    Returns vital signs time series.
+    Returns vital signs time series. now (minute-rounded) anchors the
+    window; aggregators pass a shared value.
     """
     cache_key = f"vitals_{hours}"
     cached = _get_cached(patient_id, cache_key)
     if cached:
         return cached
     
-    debug_calls = []
-    series = {
-        "hr": [],
-        "spo2": [],
-        "rr": [],
-        "sbp": []
-    }
+    session = FHIRSession.open(fhir_base, access_token, debug)
+    series = _empty_vital_series()
     
-    start_time = (datetime.now() - timedelta(hours=hours)).isoformat()
+    window_start = (now or _window_now()) - timedelta(hours=hours)
+    start_time = window_start.isoformat()
     
     try:
-        observations = await fhir_search(
-            fhir_base, access_token, "Observation",
-            {
-                "patient": patient_id,
-                "category": "vital-signs",
-                "date": f"ge{start_time}",
-                "_count": "500",
-                "_sort": "-date"
-            },
-            debug_calls
-        )
+        params = {
+            "patient": patient_id,
+            "category": "vital-signs",
+            "date": f"ge{start_time}",
+            "_count": "500",
+            "_sort": "-date"
+        }
         
-        for obs in observations:
-            time_str = obs.get("effectiveDateTime")
-            if not time_str:
-                continue
-            
-            # Get codes
-            codes = []
-            display = ""
-            if obs.get("code"):
-                display = obs["code"].get("text", "")
-                if obs["code"].get("coding"):
-                    codes = [c.get("code", "") for c in obs["code"]["coding"]]
-            
-            # Match vital type
-            vital_type = match_vital_type(codes, display)
-            if vital_type not in series:
-                continue
-            
-            # Extract value
-            value = None
-            if obs.get("valueQuantity"):
-                value = obs["valueQuantity"].get("value")
-            elif obs.get("component"):
-                # Handle BP components
-                for comp in obs["component"]:
-                    comp_codes = [c.get("code", "") for c in comp.get("code", {}).get("coding", [])]
-                    comp_display = comp.get("code", {}).get("text", "")
-                    comp_type = match_vital_type(comp_codes, comp_display)
-                    if comp_type in series and comp.get("valueQuantity"):
-                        series[comp_type].append({
-                            "time": time_str,
-                            "value": comp["valueQuantity"]["value"]
-                        })
-                continue
-            
-            if value is not None:
-                series[vital_type].append({
-                    "time": time_str,
-                    "value": value
-                })
+        # Only fetch what changed since the last full/delta fetch
+        base = _vitals_delta_base.get((patient_id, cache_key))
+        if base is not None:
+            params["_lastUpdated"] = f"gt{base['last_updated']}"
+        
+        observations = await fhir_search(session, "Observation", params)
+        last_updated = _parse_vital_observations(observations, series, VITALS_MAX_POINTS)
+        
+        if base is not None:
+            series = _merge_vital_series(base["series"], series, window_start)
+            last_updated = max(base["last_updated"], last_updated or "")
+        
+        if last_updated:
+            _vitals_delta_base[(patient_id, cache_key)] = {
+                "series": series,
+                "last_updated": last_updated
+            }
     
     except Exception as e:
         logger.error(f"Error fetching vitals: {e}")
     
-    # Downsample if > 200 points per series (keep 1 per 10-min bucket)
-    for vital_type in series:
-        if len(series[vital_type]) > 200:
-            series[vital_type] = _downsample_series(series[vital_type], 200)
+    # Downsample if > VITALS_MAX_POINTS points per series (keep 1 per time bucket), then
+    # materialize {time, value} points at the JSON boundary
+    output = {}
+    for vital_type, buf in series.items():
+        times, values = buf["time"], buf["value"]
+        output[vital_type] = [
+            {"time": times[i], "value": values[i]}
+            for i in _downsample_indices(times, VITALS_MAX_POINTS)
+        ]
     
-    result = {"series": series}
+    result = {"series": output}
     if debug:
-        result["debug"] = {"fhir_calls": debug_calls}
+        result["debug"] = {"fhir_calls": session.debug_calls}
     
     _set_cache(patient_id, cache_key, result)
     return result
 
 
-def _downsample_series(data: List[Dict], max_points: int) -> List[Dict]:
-    """Keep approximately max_points by bucketing."""
-    if len(data) <= max_points:
-        return data
+DOWNSAMPLE_BUCKET_SECONDS = 600  # widest bucket: 10 minutes
+
+
+def _downsample_indices(times: List[str], max_points: int) -> Sequence[int]:
+    """
+    Indices of the first (newest) point per time bucket, in input order.
+    
+    Buckets are span / max_points wide, capped at 10 minutes, so a series
+    just over the limit still keeps up to max_points points. If there are
+    still more than max_points buckets (long windows), the buckets are
+    thinned evenly across the whole range.
+    """
+    if len(times) <= max_points:
+        return range(len(times))
+    
+    try:
+        # Seconds precision; any UTC offset suffix is dropped
+        parsed = np.array([t[:19] for t in times], dtype="datetime64[s]")
+    except (TypeError, ValueError):
+        # Unparseable timestamps: fall back to keeping every Nth point
+        step = len(times) // max_points
+        return range(0, len(times), step)[:max_points]
+    
+    seconds = parsed.astype(np.int64)
+    oldest = seconds.min()
+    span = int(seconds.max() - oldest) + 1
+    # max_points equal-width buckets over the span, or 10-minute ones if wider
+    n_buckets = max(max_points, -(-span // DOWNSAMPLE_BUCKET_SECONDS))
+    buckets = (seconds - oldest) * n_buckets // span
+    _, idx = np.unique(buckets, return_index=True)
+    idx.sort()
     
-    # Simple: keep every Nth point
-    step = len(data) // max_points
-    return data[::step][:max_points]
+    if len(idx) > max_points:
+        idx = idx[np.linspace(0, len(idx) - 1, max_points).astype(np.int64)]
+    
+    return idx.tolist()
 
 
 # ============================================================================
@@ -543,58 +936,31 @@ async def get_ddimer_trend(
     if cached:
         return cached
     
-    debug_calls = []
+    session = FHIRSession.open(fhir_base, access_token, debug)
     series = []
     
-    start_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    start_date = _days_ago_str(days)
     
     try:
-        # Try LOINC codes first
-        ddimer_codes = ",".join(LAB_LOINC["ddimer"])
-        observations = await fhir_search(
-            fhir_base, access_token, "Observation",
-            {
-                "patient": patient_id,
-                "code": ddimer_codes,
-                "date": f"ge{start_date}",
-                "_count": "100",
-                "_sort": "-date"
-            },
-            debug_calls
+        observations = _filter_lab_observations(
+            await _fetch_labs_by_category(session, patient_id, start_date),
+            _DDIMER_CODES, _DDIMER_TEXT
         )
         
-        # Fallback: text search
-        if not observations:
-            observations = await fhir_search(
-                fhir_base, access_token, "Observation",
-                {
-                    "patient": patient_id,
-                    "category": "laboratory",
-                    "date": f"ge{start_date}",
-                    "_count": "200",
-                    "_sort": "-date"
-                },
-                debug_calls
-            )
-            observations = [
-                o for o in observations
-                if any(x in (o.get("code", {}).get("text", "") or "").lower() 
-                       for x in ["d-dimer", "ddimer", "d dimer"])
-            ]
-        
+        series_append = series.append
         for obs in observations:
             time_str = obs.get("effectiveDateTime")
             if not time_str:
                 continue
             
-            value = None
-            unit = ""
-            if obs.get("valueQuantity"):
-                value = obs["valueQuantity"].get("value")
-                unit = obs["valueQuantity"].get("unit", "")
+            vq = _vq(obs)
+            if vq is None:
+                continue
+            value = vq.get("value")
             
             if value is not None:
-                series.append({
+                unit = vq.get("unit", "")
+                series_append({
                     "time": time_str,
                     "value": value,
                     "unit": unit
@@ -605,7 +971,7 @@ async def get_ddimer_trend(
     
     result = {"series": series}
     if debug:
-        result["debug"] = {"fhir_calls": debug_calls}
+        result["debug"] = {"fhir_calls": session.debug_calls}
     
     _set_cache(patient_id, cache_key, result)
     return result
@@ -615,6 +981,22 @@ async def get_ddimer_trend(
 # Imaging Studies
 # ============================================================================
 
+# Attachments at least this large are decoded in a worker thread so a
+# multi-MB report doesn't block the event loop
+B64_THREAD_THRESHOLD = 64 * 1024
+
+
+def _decode_text_attachment(data: str) -> str:
+    return base64.b64decode(data).decode("utf-8")
+
+
+async def _b64decode_text(data: str) -> str:
+    """Decode a base64 UTF-8 attachment, off the event loop when large."""
+    if len(data) >= B64_THREAD_THRESHOLD:
+        return await asyncio.to_thread(_decode_text_attachment, data)
+    return _decode_text_attachment(data)
+
+
 async def get_imaging_studies(
     fhir_base: str,
     access_token: str,
@@ -633,32 +1015,30 @@ async def get_imaging_studies(
     if cached:
         return cached
     
-    debug_calls = []
+    session = FHIRSession.open(fhir_base, access_token, debug)
     studies = []
     
-    start_date = (datetime.now() - timedelta(days=years * 365)).strftime("%Y-%m-%d")
+    start_date = _days_ago_str(years * 365)
     
     try:
         # Try DiagnosticReport first (more common)
         reports = await fhir_search(
-            fhir_base, access_token, "DiagnosticReport",
+            session, "DiagnosticReport",
             {
                 "patient": patient_id,
                 "category": "RAD",  # Radiology
                 "date": f"ge{start_date}",
                 "_count": "50",
                 "_sort": "-date"
-            },
-            debug_calls
+            }
         )
         
         for report in reports:
             # Get title/description
-            title = ""
-            if report.get("code"):
-                title = report["code"].get("text", "")
-                if not title and report["code"].get("coding"):
-                    title = report["code"]["coding"][0].get("display", "")
+            title = (report.get("code") or {}).get("text", "")
+            if not title:
+                coding = _first_coding(report)
+                title = coding.get("display", "") if coding else ""
             
             # Check if PE-relevant
             is_relevant, imaging_type = is_pe_relevant_imaging(title)
@@ -678,21 +1058,20 @@ async def get_imaging_studies(
                 date_str = date_str[:10]
             
             # Get conclusion/snippet
-            conclusion = report.get("conclusion", "")
-            snippet = extract_imaging_snippet(conclusion)
-            
-            # Get full text if available
-            full_text = conclusion
-            if report.get("presentedForm"):
-                for form in report["presentedForm"]:
-                    if form.get("data"):
-                        # Base64 encoded text
-                        import base64
-                        try:
-                            full_text = base64.b64decode(form["data"]).decode("utf-8")
-                            snippet = extract_imaging_snippet(full_text)
-                        except:
-                            pass
+            # Get full text if available. presentedForm entries are separate
+            # attachments (not chunks of one), and the last decodable one
+            # wins, so scan from the end and stop at the first success.
+            full_text = report.get("conclusion", "")
+            for form in reversed(report.get("presentedForm") or ()):
+                if form.get("data"):
+                    # Base64 encoded text
+                    try:
+                        full_text = await _b64decode_text(form["data"])
+                        break
+                    except ValueError:
+                        # Invalid base64 or non-UTF-8 (binary) attachment
+                        pass
+            snippet = extract_imaging_snippet(full_text)
             
             studies.append({
                 "date": date_str,
@@ -711,7 +1090,7 @@ async def get_imaging_studies(
     
     result = {"studies": studies}
     if debug:
-        result["debug"] = {"fhir_calls": debug_calls}
+        result["debug"] = {"fhir_calls": session.debug_calls}
     
     _set_cache(patient_id, cache_key, result)
     return result
@@ -733,12 +1112,12 @@ async def get_clinical_summary(
     Returns a compact payload for the Essentials tab.
     Aggregates anticoagulation + diagnoses + recent vitals.
     """
-    import asyncio
-    
-    # Parallel fetch
+    # Parallel fetch - all searches share the pooled HTTP/2 client, so the
+    # three lookups (and their fallbacks) multiplex over one connection
+    now = _window_now()
     anticoag_task = get_anticoagulation_status(fhir_base, access_token, patient_id, debug)
     diagnoses_task = get_diagnoses(fhir_base, access_token, patient_id, years=5, debug=debug)
-    vitals_task = get_vitals_trend(fhir_base, access_token, patient_id, hours=12, debug=debug)
+    vitals_task = get_vitals_trend(fhir_base, access_token, patient_id, hours=12, debug=debug, now=now)
     
     anticoag, diagnoses, vitals = await asyncio.gather(
         anticoag_task, diagnoses_task, vitals_task,
@@ -780,3 +1159,42 @@ async def get_clinical_summary(
     
     return result
 
+
+# ============================================================================
+# Full Clinical Bundle
+# ============================================================================
+
+async def get_clinical_bundle(
+    fhir_base: str,
+    access_token: str,
+    patient_id: str,
+    debug: bool = False
+) -> Dict[str, Any]:
+    """
+    GET /api/clinical/bundle
+    
+    Returns anticoagulation, diagnoses, vitals, INR, D-dimer and imaging in
+    one payload. The FHIR queries are independent, so they are fanned out
+    concurrently over the shared HTTP client; a failing section is returned
+    as {"error": ...} without failing the rest.
+    """
+    now = _window_now()
+    sections = {
+        "anticoagulation": get_anticoagulation_status(fhir_base, access_token, patient_id, debug),
+        "diagnoses": get_diagnoses(fhir_base, access_token, patient_id, debug=debug),
+        "vitals": get_vitals_trend(fhir_base, access_token, patient_id, debug=debug, now=now),
+        "inr": get_inr_trend(fhir_base, access_token, patient_id, debug=debug),
+        "ddimer": get_ddimer_trend(fhir_base, access_token, patient_id, debug=debug),
+        "imaging": get_imaging_studies(fhir_base, access_token, patient_id, study_type="all", debug=debug)
+    }
+    
+    results = await asyncio.gather(*sections.values(), return_exceptions=True)
+    
+    bundle = {}
+    for name, value in zip(sections, results):
+        if isinstance(value, Exception):
+            logger.error(f"Clinical bundle section '{name}' failed: {value}")
+            value = {"error": str(value)}
+        bundle[name] = value
+    
+    return bundle
@@ -5,6 +5,7 @@ These mappings enable categorization of medications and conditions from FHIR res
 for the PE Rule-Out clinical decision support dashboard.
 """
 
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
 import re
 
@@ -44,6 +45,37 @@ MEDICATION_PATTERNS: Dict[str, List[str]] = {
 }
 
 
+def _compile_category_patterns(table: Dict[str, List[str]]) -> List[Tuple[str, "re.Pattern[str]"]]:
+    """
+    Compile one alternation regex per category.
+    
+    A single regex scan per category replaces one substring test per
+    keyword; category order (and so match precedence) is preserved.
+    """
+    return [
+        (category, re.compile("|".join(re.escape(p) for p in patterns)))
+        for category, patterns in table.items()
+    ]
+
+
+def _first_category(text_lower: str, compiled: List[Tuple[str, "re.Pattern[str]"]]) -> Optional[str]:
+    """Return the first category whose patterns occur in text_lower."""
+    for category, regex in compiled:
+        if regex.search(text_lower):
+            return category
+    return None
+
+
+_MEDICATION_REGEXES = _compile_category_patterns(MEDICATION_PATTERNS)
+
+
+def _classify_medication_lower(med_lower: str) -> str:
+    """classify_medication for an already-lowercased name."""
+    return _first_category(med_lower, _MEDICATION_REGEXES) or "Other"
+
+
+# Drug names repeat heavily across one patient's MedicationRequests
+@lru_cache(maxsize=2048)
 def classify_medication(med_name: str) -> str:
     """
     Classify a medication name into anticoagulant type.
@@ -53,14 +85,7 @@ def classify_medication(med_name: str) -> str:
     if not med_name:
         return "Other"
     
-    med_lower = med_name.lower()
-    
-    for med_type, patterns in MEDICATION_PATTERNS.items():
-        for pattern in patterns:
-            if pattern in med_lower:
-                return med_type
-    
-    return "Other"
+    return _classify_medication_lower(med_name.lower())
 
 
 def is_anticoagulant(med_name: str) -> bool:
@@ -105,6 +130,8 @@ DIAGNOSIS_PATTERNS: Dict[str, List[str]] = {
     ]
 }
 
+_DIAGNOSIS_REGEXES = _compile_category_patterns(DIAGNOSIS_PATTERNS)
+
 # ICD-10 code prefixes for diagnosis categories
 DIAGNOSIS_ICD10_PREFIXES: Dict[str, List[str]] = {
     "asthma": ["J45"],
@@ -114,7 +141,22 @@ DIAGNOSIS_ICD10_PREFIXES: Dict[str, List[str]] = {
     "pneumonia": ["J12", "J13", "J14", "J15", "J16", "J17", "J18"]
 }
 
-
+# Flattened prefix lookup: 3-char ICD-10 categories resolve with one dict
+# hit; longer prefixes (e.g. "I11.0") fall back to a short startswith scan.
+# The prefix sets don't overlap across categories, so order is irrelevant.
+_ICD10_PREFIX3: Dict[str, str] = {}
+_ICD10_PREFIX_LONG: List[Tuple[str, str]] = []
+for _category, _prefixes in DIAGNOSIS_ICD10_PREFIXES.items():
+    for _prefix in _prefixes:
+        if len(_prefix) == 3:
+            _ICD10_PREFIX3.setdefault(_prefix, _category)
+        else:
+            _ICD10_PREFIX_LONG.append((_prefix, _category))
+del _category, _prefixes, _prefix
+
+
+# Condition displays/codes repeat across encounters
+@lru_cache(maxsize=2048)
 def classify_diagnosis(display: str, code: Optional[str] = None) -> Optional[str]:
     """
     Classify a diagnosis into one of the PE mimic categories.
@@ -124,18 +166,16 @@ def classify_diagnosis(display: str, code: Optional[str] = None) -> Optional[str
     # Try code-based classification first (more reliable)
     if code:
         code_upper = code.upper()
-        for category, prefixes in DIAGNOSIS_ICD10_PREFIXES.items():
-            for prefix in prefixes:
-                if code_upper.startswith(prefix):
-                    return category
+        category = _ICD10_PREFIX3.get(code_upper[:3])
+        if category:
+            return category
+        for prefix, category in _ICD10_PREFIX_LONG:
+            if code_upper.startswith(prefix):
+                return category
     
     # Fall back to text pattern matching
     if display:
-        display_lower = display.lower()
-        for category, patterns in DIAGNOSIS_PATTERNS.items():
-            for pattern in patterns:
-                if pattern in display_lower:
-                    return category
+        return _first_category(display.lower(), _DIAGNOSIS_REGEXES)
     
     return None
 
@@ -187,6 +227,44 @@ LAB_LOINC: Dict[str, List[str]] = {
     "creatinine": ["2160-0", "38483-4"]
 }
 
+# Inverted LOINC tables: code -> type with one dict lookup. The order maps
+# keep the table precedence when several codes on one resource match.
+CODE_TO_VITAL: Dict[str, str] = {c: v for v, cs in VITAL_SIGNS_LOINC.items() for c in cs}
+CODE_TO_LAB: Dict[str, str] = {c: lab for lab, cs in LAB_LOINC.items() for c in cs}
+_VITAL_ORDER: Dict[str, int] = {v: i for i, v in enumerate(VITAL_SIGNS_LOINC)}
+_LAB_ORDER: Dict[str, int] = {lab: i for i, lab in enumerate(LAB_LOINC)}
+
+
+def _match_code(codes: List[str], code_map: Dict[str, str], order: Dict[str, int]) -> Optional[str]:
+    best = None
+    for code in codes:
+        hit = code_map.get(code)
+        if hit is not None and (best is None or order[hit] < order[best]):
+            best = hit
+    return best
+
+
+# Display-text fallbacks when no LOINC code matches (checked in order)
+VITAL_TEXT_PATTERNS: Dict[str, List[str]] = {
+    "hr": ["heart rate", "pulse", "hr"],
+    "spo2": ["oxygen saturation", "spo2", "o2 sat", "pulse ox"],
+    "rr": ["respiratory rate", "resp rate", "rr", "breathing rate"],
+    "sbp": ["systolic", "sbp"],
+    "dbp": ["diastolic", "dbp"],
+    "temp": ["temperature", "temp"],
+}
+
+LAB_TEXT_PATTERNS: Dict[str, List[str]] = {
+    "inr": ["inr"],
+    "ddimer": ["d-dimer", "ddimer", "d dimer"],
+    "troponin": ["troponin"],
+    "bnp": ["bnp", "natriuretic"],
+    "creatinine": ["creatinine"],
+}
+
+_VITAL_TEXT_REGEXES = _compile_category_patterns(VITAL_TEXT_PATTERNS)
+_LAB_TEXT_REGEXES = _compile_category_patterns(LAB_TEXT_PATTERNS)
+
 
 def match_vital_type(codes: List[str], display: str) -> Optional[str]:
     """
@@ -195,28 +273,14 @@ def match_vital_type(codes: List[str], display: str) -> Optional[str]:
     Returns: hr | spo2 | rr | sbp | dbp | temp | None
     """
     # Try LOINC code match first
-    for vital_type, loinc_codes in VITAL_SIGNS_LOINC.items():
-        for code in codes:
-            if code in loinc_codes:
-                return vital_type
+    vital_type = _match_code(codes, CODE_TO_VITAL, _VITAL_ORDER)
+    if vital_type:
+        return vital_type
     
     # Fall back to text matching
-    display_lower = display.lower() if display else ""
-    
-    if any(x in display_lower for x in ["heart rate", "pulse", "hr"]):
-        return "hr"
-    if any(x in display_lower for x in ["oxygen saturation", "spo2", "o2 sat", "pulse ox"]):
-        return "spo2"
-    if any(x in display_lower for x in ["respiratory rate", "resp rate", "rr", "breathing rate"]):
-        return "rr"
-    if any(x in display_lower for x in ["systolic", "sbp"]):
-        return "sbp"
-    if any(x in display_lower for x in ["diastolic", "dbp"]):
-        return "dbp"
-    if any(x in display_lower for x in ["temperature", "temp"]):
-        return "temp"
-    
-    return None
+    if not display:
+        return None
+    return _first_category(display.lower(), _VITAL_TEXT_REGEXES)
 
 
 def match_lab_type(codes: List[str], display: str) -> Optional[str]:
@@ -226,26 +290,14 @@ def match_lab_type(codes: List[str], display: str) -> Optional[str]:
     Returns: inr | ddimer | troponin | bnp | creatinine | None
     """
     # Try LOINC code match first
-    for lab_type, loinc_codes in LAB_LOINC.items():
-        for code in codes:
-            if code in loinc_codes:
-                return lab_type
+    lab_type = _match_code(codes, CODE_TO_LAB, _LAB_ORDER)
+    if lab_type:
+        return lab_type
     
     # Fall back to text matching
-    display_lower = display.lower() if display else ""
-    
-    if "inr" in display_lower:
-        return "inr"
-    if "d-dimer" in display_lower or "ddimer" in display_lower or "d dimer" in display_lower:
-        return "ddimer"
-    if "troponin" in display_lower:
-        return "troponin"
-    if "bnp" in display_lower or "natriuretic" in display_lower:
-        return "bnp"
-    if "creatinine" in display_lower:
-        return "creatinine"
-    
-    return None
+    if not display:
+        return None
+    return _first_category(display.lower(), _LAB_TEXT_REGEXES)
 
 
 # ============================================================================
@@ -266,6 +318,8 @@ IMAGING_PE_PATTERNS: List[str] = [
 ]
 
 
+# Radiology titles repeat heavily (e.g. "CT ANGIO CHEST W CONTRAST")
+@lru_cache(maxsize=1024)
 def is_pe_relevant_imaging(description: str) -> Tuple[bool, str]:
     """
     Check if imaging study description is relevant to PE workup.
@@ -294,8 +348,9 @@ def extract_imaging_snippet(text: str, max_length: int = 200) -> str:
     if not text:
         return ""
     
-    # Clean up whitespace
-    text = re.sub(r'\s+', ' ', text).strip()
+    # Collapse whitespace runs in one C-level split/join pass (same result
+    # as re.sub(r'\s+', ' ', text).strip(), without the regex engine)
+    text = " ".join(text.split())
     
     if len(text) <= max_length:
         return text
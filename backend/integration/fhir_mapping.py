@@ -5,13 +5,34 @@ Maps Epic FHIR resources (Patient, Observation) to PE model features.
 Uses LOINC codes for standardized lab/vital mapping.
 """
 
+import asyncio
+import hashlib
 import httpx
-from typing import Dict, Any, Optional, Tuple, List
+from typing import Dict, Any, Collection, Optional, Tuple, List
 import logging
-from datetime import datetime
+import sys
+import time
+from datetime import date, datetime
+
+import orjson
+from cachetools import TTLCache
+
+from .http_client import get_http_client
 
 logger = logging.getLogger(__name__)
 
+# Short-lived cache of Patient / Observation responses so repeated predictions
+# and frontend re-polls for the same patient skip the Epic round-trip.
+# Keys carry a hash of the access token, never the token itself.
+FHIR_RESPONSE_CACHE_TTL_SECONDS = 60
+_fhir_response_cache: TTLCache = TTLCache(
+    maxsize=256, ttl=FHIR_RESPONSE_CACHE_TTL_SECONDS, timer=time.monotonic
+)
+
+
+def _token_hash(access_token: str) -> str:
+    return hashlib.blake2b(access_token.encode(), digest_size=8).hexdigest()
+
 
 class FHIRScopeError(Exception):
     """
@@ -27,18 +48,47 @@ class FHIRScopeError(Exception):
         self.status_code = status_code
 
 
+# Observation fields read by feature mapping (code, value*, component) and by
+# the /api/fhir/observations normalizer (effectiveDateTime, issued)
+_OBSERVATION_FIELDS = (
+    "resourceType",
+    "id",
+    "code",
+    "valueQuantity",
+    "valueInteger",
+    "valueDecimal",
+    "valueString",
+    "component",
+    "effectiveDateTime",
+    "issued",
+)
+
+
+# Same projection requested server-side via _elements (base names for the
+# value[x]/effective[x] choice types; id/meta/resourceType always come back).
+# Servers that ignore _elements are still covered by _project_observation.
+OBSERVATION_ELEMENTS = "code,value,component,effective,issued"
+
+
+def _project_observation(resource: Dict[str, Any]) -> Dict[str, Any]:
+    """Drop Observation fields nothing downstream reads (narrative, meta, references, ...)."""
+    return {key: resource[key] for key in _OBSERVATION_FIELDS if key in resource}
+
+
 class FHIRClient:
     """
     Simple FHIR client for Epic sandbox integration.
     """
     
-    def __init__(self, base_url: str, access_token: str):
+    def __init__(self, base_url: str, access_token: str, client: Optional[httpx.AsyncClient] = None):
         """
         Initialize FHIR client.
         
         Args:
             base_url: FHIR server base URL (e.g., https://fhir.epic.com/interconnect-fhir-oauth/api/FHIR/R4)
             access_token: OAuth access token
+            client: HTTP client to send requests with (defaults to the shared
+                pooled client, so connections are kept alive across requests)
         """
         self.base_url = base_url.rstrip("/")
         self.access_token = access_token
@@ -46,6 +96,12 @@ class FHIRClient:
             "Authorization": f"Bearer {access_token}",
             "Accept": "application/fhir+json"
         }
+        self._client = client
+        self._cache_prefix = (self.base_url, _token_hash(access_token))
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        return self._client or get_http_client()
     
     async def get_patient(self, patient_id: str) -> Dict[str, Any]:
         """
@@ -60,33 +116,39 @@ class FHIRClient:
         Raises:
             httpx.HTTPStatusError: On HTTP errors (401, 403, etc.)
         """
+        cache_key = (*self._cache_prefix, "Patient", patient_id)
+        cached = _fhir_response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         url = f"{self.base_url}/Patient/{patient_id}"
         logger.info(f"Fetching Patient: {url}")
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=self.headers, timeout=10.0)
-            
-            if response.status_code == 401:
-                logger.error("Patient fetch failed: 401 Unauthorized - token expired or invalid")
-                raise httpx.HTTPStatusError("Token expired or invalid", request=response.request, response=response)
-            if response.status_code == 403:
-                error_body = ""
-                try:
-                    error_body = response.text[:500]
-                except Exception:
-                    pass
-                logger.error(f"Patient fetch failed: 403 Forbidden")
-                logger.error(f"  URL: {url}")
-                logger.error(f"  Response body: {error_body}")
-                raise FHIRScopeError(
-                    message="Forbidden: token lacks user/Patient.read scope",
-                    failed_url=url,
-                    response_body=error_body,
-                    status_code=403
-                )
-            
-            response.raise_for_status()
-            return response.json()
+        response = await self.client.get(url, headers=self.headers, timeout=10.0)
+        
+        if response.status_code == 401:
+            logger.error("Patient fetch failed: 401 Unauthorized - token expired or invalid")
+            raise httpx.HTTPStatusError("Token expired or invalid", request=response.request, response=response)
+        if response.status_code == 403:
+            error_body = ""
+            try:
+                error_body = response.text[:500]
+            except Exception:
+                pass
+            logger.error(f"Patient fetch failed: 403 Forbidden")
+            logger.error(f"  URL: {url}")
+            logger.error(f"  Response body: {error_body}")
+            raise FHIRScopeError(
+                message="Forbidden: token lacks user/Patient.read scope",
+                failed_url=url,
+                response_body=error_body,
+                status_code=403
+            )
+        
+        response.raise_for_status()
+        patient = orjson.loads(response.content)
+        _fhir_response_cache[cache_key] = patient
+        return patient
     
     async def get_observations(
         self, 
@@ -107,11 +169,17 @@ class FHIRClient:
         Returns:
             List of Observation resources
         """
+        cache_key = (*self._cache_prefix, "Observation", patient_id, category, code, max_results)
+        cached = _fhir_response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         url = f"{self.base_url}/Observation"
         params = {
             "patient": patient_id,
             "_count": max_results,
-            "_sort": "-date"  # Most recent first
+            "_sort": "-date",  # Most recent first
+            "_elements": OBSERVATION_ELEMENTS
         }
         
         if category:
@@ -119,43 +187,45 @@ class FHIRClient:
         if code:
             params["code"] = code
         
-        full_url = f"{url}?{'&'.join(f'{k}={v}' for k, v in params.items())}"
+        # Encode the query once; the same URL is sent and logged
+        request_url = httpx.URL(url, params=params)
+        full_url = str(request_url)
         logger.info(f"Fetching Observations: {full_url}")
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=self.headers, params=params, timeout=10.0)
-            
-            if response.status_code == 401:
-                logger.error("Observation fetch failed: 401 Unauthorized - token expired or invalid")
-                raise httpx.HTTPStatusError("Token expired or invalid", request=response.request, response=response)
-            if response.status_code == 403:
-                # Get detailed error info
-                error_body = ""
-                try:
-                    error_body = response.text[:500]
-                except Exception:
-                    pass
-                logger.error(f"Observation fetch failed: 403 Forbidden")
-                logger.error(f"  URL: {full_url}")
-                logger.error(f"  Response body: {error_body}")
-                raise FHIRScopeError(
-                    message="Forbidden: token lacks user/Observation.read scope",
-                    failed_url=full_url,
-                    response_body=error_body,
-                    status_code=403
-                )
-            
-            response.raise_for_status()
-            bundle = response.json()
+        response = await self.client.get(request_url, headers=self.headers, timeout=10.0)
         
-        # Extract entries
-        observations = []
-        if bundle.get("entry"):
-            for entry in bundle["entry"]:
-                if "resource" in entry:
-                    observations.append(entry["resource"])
+        if response.status_code == 401:
+            logger.error("Observation fetch failed: 401 Unauthorized - token expired or invalid")
+            raise httpx.HTTPStatusError("Token expired or invalid", request=response.request, response=response)
+        if response.status_code == 403:
+            # Get detailed error info
+            error_body = ""
+            try:
+                error_body = response.text[:500]
+            except Exception:
+                pass
+            logger.error(f"Observation fetch failed: 403 Forbidden")
+            logger.error(f"  URL: {full_url}")
+            logger.error(f"  Response body: {error_body}")
+            raise FHIRScopeError(
+                message="Forbidden: token lacks user/Observation.read scope",
+                failed_url=full_url,
+                response_body=error_body,
+                status_code=403
+            )
+        
+        response.raise_for_status()
+        bundle = orjson.loads(response.content)
+        
+        # Extract entries, keeping only the fields consumers read
+        observations = [
+            _project_observation(entry["resource"])
+            for entry in bundle.get("entry") or ()
+            if "resource" in entry
+        ]
         
         logger.info(f"Found {len(observations)} observations")
+        _fhir_response_cache[cache_key] = observations
         return observations
     
     async def get_observations_by_categories(
@@ -169,6 +239,7 @@ class FHIRClient:
         
         Returns (vitals, labs) tuple. If a category fails with 403, logs details
         and returns empty list for that category rather than failing entirely.
+        Categories are fetched concurrently.
         """
         if categories is None:
             categories = ["vital-signs", "laboratory"]
@@ -176,30 +247,35 @@ class FHIRClient:
         results = {"vital-signs": [], "laboratory": []}
         errors = []
         
-        for category in categories:
-            try:
-                obs = await self.get_observations(
-                    patient_id=patient_id,
-                    category=category,
-                    max_results=max_results
-                )
-                results[category] = obs
-            except FHIRScopeError as e:
-                logger.error(f"Failed to fetch {category}: {e.message}")
+        fetched = await asyncio.gather(
+            *(
+                self.get_observations(patient_id=patient_id, category=category, max_results=max_results)
+                for category in categories
+            ),
+            return_exceptions=True
+        )
+        
+        for category, outcome in zip(categories, fetched):
+            if isinstance(outcome, FHIRScopeError):
+                logger.error(f"Failed to fetch {category}: {outcome.message}")
                 errors.append({
                     "category": category,
-                    "error": e.message,
-                    "url": e.failed_url,
-                    "status_code": e.status_code
+                    "error": outcome.message,
+                    "url": outcome.failed_url,
+                    "status_code": outcome.status_code
                 })
-            except Exception as e:
-                logger.error(f"Failed to fetch {category}: {e}")
+            elif isinstance(outcome, Exception):
+                logger.error(f"Failed to fetch {category}: {outcome}")
                 errors.append({
                     "category": category,
-                    "error": str(e),
+                    "error": str(outcome),
                     "url": None,
                     "status_code": None
                 })
+            elif isinstance(outcome, BaseException):
+                raise outcome
+            else:
+                results[category] = outcome
         
         if errors:
             logger.warning(f"Observation fetch errors: {errors}")
@@ -211,6 +287,10 @@ class FHIRClient:
 # LOINC Code Mappings
 # ============================================================================
 
+# Interned so comparisons against parsed coding.system values that are the
+# same object (str == checks identity first) skip the character compare
+LOINC_SYSTEM = sys.intern("http://loinc.org")
+
 # Standard LOINC codes for vitals
 VITAL_SIGNS_LOINC = {
     "heart_rate": ["8867-4"],  # Heart rate
@@ -242,6 +322,88 @@ LAB_LOINC = {
     "ph": ["2744-1"],  # pH
 }
 
+# frozensets so code membership checks are hash probes, not list scans
+VITAL_SIGNS_LOINC = {name: frozenset(codes) for name, codes in VITAL_SIGNS_LOINC.items()}
+LAB_LOINC = {name: frozenset(codes) for name, codes in LAB_LOINC.items()}
+
+# PE model input features, in the order map_fhir_to_features reports them
+MODEL_FEATURES = (
+    "age",
+    "gender",
+    "bmi",
+    "height_cm",
+    "weight_lbs",
+    "triage_hr",
+    "triage_rr",
+    "triage_o2sat",
+    "triage_temp",
+    "triage_sbp",
+    "triage_dbp",
+    "d_dimer",
+    "troponin_t",
+    "ntprobnp",
+    "creatinine",
+    "hemoglobin",
+    "wbc",
+    "platelet",
+    "sodium",
+    "potassium",
+    "bun",
+    "glucose",
+    "lactate",
+    "po2",
+    "pco2",
+)
+
+# Model feature each vital sign is reported under (height/weight are converted
+# to height_cm / weight_lbs / bmi by map_fhir_to_features)
+VITAL_FEATURE_NAMES = {
+    "heart_rate": "triage_hr",
+    "respiratory_rate": "triage_rr",
+    "oxygen_saturation": "triage_o2sat",
+    "body_temperature": "triage_temp",
+    "systolic_bp": "triage_sbp",
+    "diastolic_bp": "triage_dbp",
+    "height": "height_m",
+    "weight": "weight_kg",
+}
+
+# Reverse lookup: LOINC code -> feature name (constant, built at import).
+# Specialized to the model schema: codes whose feature the model does not
+# take (e.g. pH) are left out, so the scan never even reads their values.
+_LOINC_TARGETS = frozenset(MODEL_FEATURES) | {"height_m", "weight_kg"}
+LOINC_TO_FEATURE = {
+    code: feature
+    for feature, codes in [
+        *((VITAL_FEATURE_NAMES[name], codes) for name, codes in VITAL_SIGNS_LOINC.items()),
+        *LAB_LOINC.items(),
+    ]
+    if feature in _LOINC_TARGETS
+    for code in codes
+}
+_LOINC_FEATURE_COUNT = len(set(LOINC_TO_FEATURE.values()))
+
+# Comma-joined (OR) code filter so one Observation search returns only the
+# observations feature mapping can use
+FEATURE_LOINC_CODES = ",".join(sorted(LOINC_TO_FEATURE))
+
+
+def _try_float(value: Any) -> Optional[float]:
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+# (value[x] key, converter) in lookup order: valueQuantity first (most common
+# for numeric obs), then integer/decimal, then a numeric string
+_VALUE_EXTRACTORS = (
+    ("valueQuantity", lambda quantity: quantity.get("value")),
+    ("valueInteger", float),
+    ("valueDecimal", float),
+    ("valueString", _try_float),
+)
+
 
 def extract_observation_value(observation: Dict[str, Any]) -> Optional[float]:
     """
@@ -249,24 +411,14 @@ def extract_observation_value(observation: Dict[str, Any]) -> Optional[float]:
     
     Handles different value types: valueQuantity, valueString, valueInteger, etc.
     """
-    # Try valueQuantity first (most common for numeric obs)
-    if "valueQuantity" in observation:
-        return observation["valueQuantity"].get("value")
-    
-    # Try valueInteger
-    if "valueInteger" in observation:
-        return float(observation["valueInteger"])
-    
-    # Try valueDecimal
-    if "valueDecimal" in observation:
-        return float(observation["valueDecimal"])
-    
-    # Try valueString (attempt conversion)
-    if "valueString" in observation:
-        try:
-            return float(observation["valueString"])
-        except (ValueError, TypeError):
-            pass
+    for key, convert in _VALUE_EXTRACTORS:
+        raw = observation.get(key)
+        if raw is None:
+            continue
+        value = convert(raw)
+        # A non-numeric valueString falls through to the components
+        if value is not None or key != "valueString":
+            return value
     
     # Try component (for blood pressure, etc.)
     if "component" in observation:
@@ -278,9 +430,29 @@ def extract_observation_value(observation: Dict[str, Any]) -> Optional[float]:
     return None
 
 
+def _observation_value(obs: Dict[str, Any]) -> Optional[float]:
+    """extract_observation_value with the common valueQuantity case inlined."""
+    vq = obs.get("valueQuantity")
+    if vq is not None:
+        return vq.get("value")
+    return extract_observation_value(obs)
+
+
+def _scan_observation(obs: Dict[str, Any], loinc_codes: Collection[str]) -> Optional[float]:
+    """
+    Value of obs if it carries one of loinc_codes, else None.
+    
+    Matches the coding and reads the value in one pass over the resource.
+    """
+    for coding in (obs.get("code") or {}).get("coding") or ():
+        if coding.get("system") == LOINC_SYSTEM and coding.get("code") in loinc_codes:
+            return _observation_value(obs)
+    return None
+
+
 def find_observation_by_loinc(
     observations: List[Dict[str, Any]], 
-    loinc_codes: List[str]
+    loinc_codes: Collection[str]
 ) -> Optional[float]:
     """
     Find and extract value from observation matching LOINC codes.
@@ -288,79 +460,88 @@ def find_observation_by_loinc(
     Returns the most recent observation matching any of the provided codes.
     """
     for obs in observations:
-        # Check if this observation matches any of the LOINC codes
-        if "code" in obs and "coding" in obs["code"]:
-            for coding in obs["code"]["coding"]:
-                if coding.get("system") == "http://loinc.org":
-                    if coding.get("code") in loinc_codes:
-                        # Found match - extract value
-                        value = extract_observation_value(obs)
-                        if value is not None:
-                            return value
+        value = _scan_observation(obs, loinc_codes)
+        if value is not None:
+            return value
     return None
 
 
+def extract_loinc_features(observations: List[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    Extract feature values from observations in a single pass.
+    
+    Each feature takes the value of the first (most recent, as searches sort
+    by -date) observation with a mapped LOINC code and a usable value - the
+    same result as calling find_observation_by_loinc per feature. Stops
+    as soon as every mapped feature has a value.
+    """
+    values = {}
+    for obs in observations:
+        if len(values) == _LOINC_FEATURE_COUNT:
+            break
+        value = None
+        for coding in (obs.get("code") or {}).get("coding") or ():
+            if coding.get("system") != LOINC_SYSTEM:
+                continue
+            feature = LOINC_TO_FEATURE.get(coding.get("code"))
+            if feature is None or feature in values:
+                continue
+            # Read the value once per observation, on its first mapped code
+            if value is None:
+                value = _observation_value(obs)
+                if value is None:
+                    break
+            values[feature] = value
+    return values
+
+
 async def map_fhir_to_features(
     fhir_client: FHIRClient,
-    patient_id: str
-) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    patient_id: str,
+    include_summary: bool = True
+) -> Tuple[Dict[str, Any], Optional[Dict[str, Any]]]:
     """
     Map FHIR resources to PE model features.
     
     Args:
         fhir_client: Authenticated FHIR client
         patient_id: Patient FHIR ID
+        include_summary: Build the display summary (skip when only the model
+            input is needed)
     
     Returns:
         Tuple of:
         - features: Dict mapping feature names to values (for model input)
-        - summary: Dict with readable feature summary (for display)
+        - summary: Dict with readable feature summary (for display), or None
+          if include_summary is False
     """
     logger.info(f"Mapping FHIR data for patient {patient_id}")
     
     # Initialize features dict with None (will be imputed by model)
-    features = {
-        "age": None,
-        "gender": None,
-        "bmi": None,
-        "height_cm": None,
-        "weight_lbs": None,
-        "triage_hr": None,
-        "triage_rr": None,
-        "triage_o2sat": None,
-        "triage_temp": None,
-        "triage_sbp": None,
-        "triage_dbp": None,
-        "d_dimer": None,
-        "troponin_t": None,
-        "ntprobnp": None,
-        "creatinine": None,
-        "hemoglobin": None,
-        "wbc": None,
-        "platelet": None,
-        "sodium": None,
-        "potassium": None,
-        "bun": None,
-        "glucose": None,
-        "lactate": None,
-        "po2": None,
-        "pco2": None,
-    }
+    features = dict.fromkeys(MODEL_FEATURES)
     
     try:
-        # Fetch Patient resource
-        patient = await fhir_client.get_patient(patient_id)
+        # Fetch Patient and the mapped observations concurrently - the
+        # observation search only needs the ID. A Patient failure takes
+        # precedence so callers see the same error as with sequential fetches.
+        patient, observations = await asyncio.gather(
+            fhir_client.get_patient(patient_id),
+            fhir_client.get_observations(patient_id, code=FEATURE_LOINC_CODES, max_results=200),
+            return_exceptions=True
+        )
+        for outcome in (patient, observations):
+            if isinstance(outcome, BaseException):
+                raise outcome
         
         # Extract demographics
         features["gender"] = extract_gender(patient)
         features["age"] = extract_age(patient)
         
-        # Fetch all observations
-        observations = await fhir_client.get_observations(patient_id, max_results=200)
+        # One pass over the observations, assigning features by LOINC code
+        loinc_values = extract_loinc_features(observations)
         
-        # Extract vitals (use triage_ prefix as model expects)
-        height_m = find_observation_by_loinc(observations, VITAL_SIGNS_LOINC["height"])
-        weight_kg = find_observation_by_loinc(observations, VITAL_SIGNS_LOINC["weight"])
+        height_m = loinc_values.pop("height_m", None)
+        weight_kg = loinc_values.pop("weight_kg", None)
         
         if height_m:
             features["height_cm"] = height_m * 100  # Convert m to cm
@@ -372,32 +553,11 @@ async def map_fhir_to_features(
         if height_m and weight_kg:
             features["bmi"] = weight_kg / (height_m ** 2)
         
-        # Vital signs (triage values)
-        features["triage_hr"] = find_observation_by_loinc(observations, VITAL_SIGNS_LOINC["heart_rate"])
-        features["triage_rr"] = find_observation_by_loinc(observations, VITAL_SIGNS_LOINC["respiratory_rate"])
-        features["triage_o2sat"] = find_observation_by_loinc(observations, VITAL_SIGNS_LOINC["oxygen_saturation"])
-        features["triage_temp"] = find_observation_by_loinc(observations, VITAL_SIGNS_LOINC["body_temperature"])
-        features["triage_sbp"] = find_observation_by_loinc(observations, VITAL_SIGNS_LOINC["systolic_bp"])
-        features["triage_dbp"] = find_observation_by_loinc(observations, VITAL_SIGNS_LOINC["diastolic_bp"])
-        
-        # Lab values
-        features["d_dimer"] = find_observation_by_loinc(observations, LAB_LOINC["d_dimer"])
-        features["troponin_t"] = find_observation_by_loinc(observations, LAB_LOINC["troponin_t"])
-        features["ntprobnp"] = find_observation_by_loinc(observations, LAB_LOINC["ntprobnp"])
-        features["creatinine"] = find_observation_by_loinc(observations, LAB_LOINC["creatinine"])
-        features["hemoglobin"] = find_observation_by_loinc(observations, LAB_LOINC["hemoglobin"])
-        features["wbc"] = find_observation_by_loinc(observations, LAB_LOINC["wbc"])
-        features["platelet"] = find_observation_by_loinc(observations, LAB_LOINC["platelet"])
-        features["sodium"] = find_observation_by_loinc(observations, LAB_LOINC["sodium"])
-        features["potassium"] = find_observation_by_loinc(observations, LAB_LOINC["potassium"])
-        features["bun"] = find_observation_by_loinc(observations, LAB_LOINC["bun"])
-        features["glucose"] = find_observation_by_loinc(observations, LAB_LOINC["glucose"])
-        features["lactate"] = find_observation_by_loinc(observations, LAB_LOINC["lactate"])
-        features["po2"] = find_observation_by_loinc(observations, LAB_LOINC["po2"])
-        features["pco2"] = find_observation_by_loinc(observations, LAB_LOINC["pco2"])
+        # Vital signs (triage_ prefix as model expects) and lab values
+        features.update(loinc_values)
         
         # Build human-readable summary
-        summary = _build_feature_summary(features)
+        summary = _build_feature_summary(features) if include_summary else None
         
         # Log data availability
         available = sum(1 for v in features.values() if v is not None)
@@ -425,14 +585,35 @@ def extract_gender(patient: Dict[str, Any]) -> Optional[str]:
     return None
 
 
+# (monotonic expiry, today) - refreshed hourly and never past local midnight
+_today_cache: Tuple[float, Optional[date]] = (0.0, None)
+
+
+def _today() -> date:
+    """Today's local date, re-read from the wall clock at most once an hour."""
+    global _today_cache
+    
+    mono = time.monotonic()
+    expires_at, today = _today_cache
+    if today is None or mono >= expires_at:
+        now = datetime.now()
+        seconds_to_midnight = 86400 - (now.hour * 3600 + now.minute * 60 + now.second)
+        today = now.date()
+        _today_cache = (mono + min(3600, seconds_to_midnight), today)
+    return today
+
+
 def extract_age(patient: Dict[str, Any]) -> Optional[int]:
     """Calculate age from Patient birthDate"""
     birth_date_str = patient.get("birthDate")
     if birth_date_str:
         try:
-            from datetime import datetime
-            birth_date = datetime.strptime(birth_date_str, "%Y-%m-%d")
-            today = datetime.now()
+            # Fixed YYYY-MM-DD format: slice instead of strptime; date()
+            # still rejects out-of-range months/days
+            if len(birth_date_str) != 10:
+                raise ValueError(f"expected YYYY-MM-DD, got {birth_date_str!r}")
+            birth_date = date(int(birth_date_str[0:4]), int(birth_date_str[5:7]), int(birth_date_str[8:10]))
+            today = _today()
             age = today.year - birth_date.year
             # Adjust if birthday hasn't occurred yet this year
             if (today.month, today.day) < (birth_date.month, birth_date.day):
@@ -443,6 +624,11 @@ def extract_age(patient: Dict[str, Any]) -> Optional[int]:
     return None
 
 
+# Placeholder shown in the feature summary for a missing value; shared with the
+# assessment endpoint, which counts summary entries that are not this
+NOT_AVAILABLE = "Not available"
+
+
 def _build_feature_summary(features: Dict[str, Any]) -> Dict[str, Any]:
     """
     Build human-readable feature summary for display.
@@ -451,13 +637,13 @@ def _build_feature_summary(features: Dict[str, Any]) -> Dict[str, Any]:
     """
     def format_value(value, unit=""):
         if value is None:
-            return "Not available"
+            return NOT_AVAILABLE
         return f"{value:.1f} {unit}".strip()
     
     summary = {
         "demographics": {
             "age": format_value(features.get("age"), "years"),
-            "gender": features.get("gender") or "Not available",
+            "gender": features.get("gender") or NOT_AVAILABLE,
             "bmi": format_value(features.get("bmi"), "kg/m²"),
             "height": format_value(features.get("height_cm"), "cm"),
             "weight": format_value(features.get("weight_lbs"), "lbs"),
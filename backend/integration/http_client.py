@@ -0,0 +1,58 @@
+"""
+Shared HTTP client for outbound FHIR / OAuth calls.
+
+A single pooled httpx.AsyncClient is reused across requests so repeated
+calls to Epic keep their TCP/TLS connections alive instead of paying a
+fresh handshake per call.
+"""
+
+import asyncio
+from typing import Optional
+import logging
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Concurrent fan-outs (clinical summary/bundle) multiplex as HTTP/2 streams
+# over one connection per host; the pool cap only matters for HTTP/1.1 hosts.
+# Keep every connection alive so fan-outs never pay a fresh TLS handshake.
+HTTP_POOL_LIMITS = httpx.Limits(
+    max_connections=32,
+    max_keepalive_connections=32,
+    keepalive_expiry=60.0
+)
+
+_HTTP_CLIENT: Optional[httpx.AsyncClient] = None
+_HTTP_CLIENT_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared AsyncClient, creating it lazily.
+
+    Pooled connections are bound to the event loop that opened them, so a
+    new client is created if the running loop has changed (e.g. tests or
+    scripts calling asyncio.run more than once).
+    """
+    global _HTTP_CLIENT, _HTTP_CLIENT_LOOP
+
+    loop = asyncio.get_running_loop()
+    if _HTTP_CLIENT is None or _HTTP_CLIENT.is_closed or _HTTP_CLIENT_LOOP is not loop:
+        _HTTP_CLIENT = httpx.AsyncClient(
+            http2=True,
+            timeout=15.0,
+            limits=HTTP_POOL_LIMITS
+        )
+        _HTTP_CLIENT_LOOP = loop
+        logger.debug("Created shared HTTP client")
+    return _HTTP_CLIENT
+
+
+async def close_http_client():
+    """Close the shared AsyncClient (called on app shutdown)."""
+    global _HTTP_CLIENT, _HTTP_CLIENT_LOOP
+
+    if _HTTP_CLIENT is not None and not _HTTP_CLIENT.is_closed:
+        await _HTTP_CLIENT.aclose()
+    _HTTP_CLIENT = None
+    _HTTP_CLIENT_LOOP = None
@@ -9,14 +9,28 @@ from fastapi import FastAPI, HTTPException, Request, Depends
 from fastapi.responses import RedirectResponse, JSONResponse, HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
+import asyncio
 import os
+import base64
+import string
 import logging
-import traceback
+import secrets
+import time
+from dataclasses import dataclass
 from datetime import datetime
+from html import escape
+
+import httpx
+import orjson
+from cachetools import TLRUCache, TTLCache
 
 from pe_model.serve_model import load_pe_model, predict_pe_probability, interpret_pe_result
-from integration.fhir_mapping import FHIRClient, map_fhir_to_features, FHIRScopeError
+from integration.fhir_mapping import (
+    FHIRClient, map_fhir_to_features, FHIRScopeError,
+    FEATURE_LOINC_CODES, FHIR_RESPONSE_CACHE_TTL_SECONDS, LOINC_SYSTEM, NOT_AVAILABLE
+)
+from integration.http_client import close_http_client, get_http_client
 from config import epic_config
 
 # Load environment variables from .env file
@@ -30,11 +44,19 @@ logger = logging.getLogger(__name__)
 # Use centralized config for sandbox mode
 SANDBOX_MODE = epic_config.is_sandbox
 
+class ORJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (also handles numpy scalars/arrays)."""
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title="PE Rule-Out SMART on FHIR Demo",
     description="Demonstration of PE rule-out model integrated with Epic FHIR sandbox",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -55,25 +77,84 @@ app.add_middleware(
     expose_headers=["Set-Cookie"],
 )
 
-# In-memory session storage (prototype only - use Redis/DB in production)
-sessions = {}
-
-# Last token exchange result (for debugging)
-last_token_exchange = {
-    "status_code": None,
-    "scope": None,
-    "error": None,
-    "error_description": None,
-    "timestamp": None,
-    "raw_body_preview": None
-}
-
-# Auth-in-progress tracking (to prevent duplicate auth attempts)
-auth_progress = {
-    "in_progress": False,
-    "started_at": None,
-    "state": None
-}
+# In-memory session storage (prototype only - use Redis/DB in production).
+# Each entry is evicted at its token's expires_at (wall-clock epoch seconds),
+# and the LRU bound caps memory regardless of OAuth traffic.
+SESSION_STORE_MAX_SIZE = 10_000
+
+sessions: TLRUCache = TLRUCache(
+    maxsize=SESSION_STORE_MAX_SIZE,
+    ttu=lambda _sid, session, _now: session["expires_at"],
+    timer=time.time
+)
+
+
+def _lookup_session(session_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """Return the stored session for session_id (single dict probe), or None."""
+    return sessions.get(session_id) if session_id else None
+
+
+@dataclass(slots=True)
+class LastTokenExchange:
+    """Last token exchange result (for debugging)"""
+    status_code: Any = None  # HTTP status, or a marker such as "PENDING"
+    scope: Optional[str] = None
+    error: Optional[str] = None
+    error_description: Optional[str] = None
+    timestamp: Optional[str] = None
+    raw_body_preview: Optional[str] = None
+    
+    def record(
+        self,
+        status_code: Any,
+        error: Optional[str] = None,
+        error_description: Optional[str] = None,
+        raw_body_preview: Optional[str] = None,
+        scope: Optional[str] = None
+    ):
+        """Overwrite every field with the outcome of the latest exchange, stamped now."""
+        self.status_code = status_code
+        self.scope = scope
+        self.error = error
+        self.error_description = error_description
+        self.timestamp = datetime.now().isoformat()
+        self.raw_body_preview = raw_body_preview
+    
+    def clear(self):
+        self.status_code = None
+        self.scope = None
+        self.error = None
+        self.error_description = None
+        self.timestamp = None
+        self.raw_body_preview = None
+
+
+@dataclass(slots=True)
+class AuthProgress:
+    """Auth-in-progress tracking (to prevent duplicate auth attempts)"""
+    in_progress: bool = False
+    started_at: Optional[float] = None  # time.monotonic(), not wall-clock
+    state: Optional[str] = None
+    
+    def clear(self):
+        self.in_progress = False
+        self.started_at = None
+        self.state = None
+
+
+last_token_exchange = LastTokenExchange()
+auth_progress = AuthProgress()
+
+
+def _record_auth_failure(
+    status_code: Any,
+    error: Optional[str],
+    error_description: Optional[str],
+    raw_body_preview: Optional[str]
+):
+    """Record a failed OAuth callback for /api/auth/last-token and release the auth lock."""
+    last_token_exchange.record(status_code, error, error_description, raw_body_preview)
+    auth_progress.clear()
 
 # Initialize model at startup
 @app.on_event("startup")
@@ -98,6 +179,12 @@ async def startup_event():
         raise
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close the shared outbound HTTP client"""
+    await close_http_client()
+
+
 # ============================================================================
 # SMART on FHIR OAuth Flow
 # ============================================================================
@@ -122,57 +209,47 @@ async def launch(iss: Optional[str] = None, launch: Optional[str] = None):
     - iss: FHIR server base URL (optional, for EHR launch)
     - launch: Launch token (optional, for EHR launch)
     """
-    logger.info("=" * 60)
-    logger.info("SMART LAUNCH INITIATED")
-    logger.info("=" * 60)
-    
-    # Check if auth is already in progress (prevent duplicate redirects)
-    if auth_progress["in_progress"] and auth_progress["started_at"]:
-        elapsed = datetime.now().timestamp() - auth_progress["started_at"]
+    # Check if auth is already in progress (prevent duplicate redirects).
+    # The check here and the mark at the bottom run with no await in between,
+    # so on the single event loop they are atomic; keep launch() await-free
+    # (or add an asyncio.Lock) if that ever changes.
+    if auth_progress.in_progress and auth_progress.started_at is not None:
+        elapsed = time.monotonic() - auth_progress.started_at
         if elapsed < 180:  # 3 minutes - reduced from 5 to avoid stuck states
-            logger.warning(f"Auth already in progress (started {elapsed:.0f}s ago). Returning 409.")
+            logger.warning("Auth already in progress (started %.0fs ago). Returning 409.", elapsed)
             raise HTTPException(
                 status_code=409,
                 detail=f"Authentication already in progress ({int(elapsed)}s ago). Complete the current auth flow or reset."
             )
         else:
             # Auth timed out, treat as stale and allow new attempt
-            logger.info(f"Previous auth stale after {elapsed:.0f}s. Clearing and allowing new attempt.")
-            auth_progress["in_progress"] = False
-            auth_progress["state"] = None
-            auth_progress["started_at"] = None
+            logger.info("Previous auth stale after %.0fs. Clearing and allowing new attempt.", elapsed)
+            auth_progress.clear()
     
     # Determine launch mode
     is_ehr_launch = bool(iss and launch)
     launch_mode = "EHR Launch" if is_ehr_launch else "Standalone Launch"
-    logger.info(f"  Launch Mode: {launch_mode}")
-    logger.info(f"  iss param: {iss}")
-    logger.info(f"  launch param: {launch}")
     
-    # Validate config
+    # Validate config (checked once at config load; this only re-raises the result)
     try:
         epic_config.validate()
     except ValueError as e:
         logger.error(f"Config validation failed: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     
-    # STRICT VALIDATION before redirect
+    # Config issues are itemized once in the startup log; just flag them here
     config_errors = epic_config.get_config_errors()
     if config_errors:
-        logger.warning("=" * 60)
-        logger.warning("CONFIG ISSUES DETECTED:")
-        for err in config_errors:
-            if err.startswith("ERROR"):
-                logger.error(f"  {err}")
-            else:
-                logger.warning(f"  {err}")
-        logger.warning("=" * 60)
+        logger.warning(
+            "Launching with %d config issue(s) - see startup log or /api/auth/diagnostics",
+            len(config_errors)
+        )
     
     # Use normalized redirect_uri from config (ONE source of truth)
     redirect_uri = epic_config.get_normalize_redirect_uri()
     
-    # Generate state
-    state = f"state_{datetime.now().timestamp()}"
+    # Generate state (unguessable, RFC 6749 section 10.12)
+    state = f"state_{secrets.token_urlsafe(32)}"
     
     # ASSERTION: aud ALWAYS equals FHIR_BASE_URL (single source of truth)
     # For standalone launch, this is our configured value
@@ -182,89 +259,47 @@ async def launch(iss: Optional[str] = None, launch: Optional[str] = None):
     if is_ehr_launch and iss and iss != epic_config.fhir_base_url:
         logger.warning(f"EHR launch provided iss={iss} but using configured FHIR_BASE_URL={aud}")
     
-    # Build auth params using config values
-    auth_params = {
-        "response_type": "code",
-        "client_id": epic_config.client_id,
-        "redirect_uri": redirect_uri,
-        "scope": epic_config.scope,
-        "state": state,
-        "aud": aud,
-    }
-    
-    # Only include launch token for EHR launch
-    if is_ehr_launch and launch:
-        auth_params["launch"] = launch
-    
-    # VALIDATION: Ensure scope contains FHIR scopes (not just openid/fhirUser)
-    scope_parts = epic_config.scope.split()
-    fhir_scopes = [s for s in scope_parts if s.startswith("patient/") or s.startswith("user/")]
-    if not fhir_scopes:
-        logger.error(f"CRITICAL: Scope missing FHIR scopes! Only has: {epic_config.scope}")
-    
-    # Build query string with proper URL encoding
-    from urllib.parse import urlencode
-    query = urlencode(auth_params)
-    authorization_url = f"{epic_config.auth_url}?{query}"
-    
-    # Log ALL parameters for debugging
-    logger.info("-" * 60)
-    logger.info("OAuth Parameters (VERIFY AGAINST EPIC APP REGISTRATION):")
-    logger.info(f"  EPIC_ENV: {epic_config.env}")
-    logger.info(f"  client_id: {epic_config.client_id}")
-    logger.info(f"  redirect_uri (EXACT): {redirect_uri}")
-    logger.info(f"  scope: {epic_config.scope}")
-    logger.info(f"  aud: {aud}")
-    logger.info(f"  response_type: code")
-    logger.info(f"  state: {state}")
-    logger.info("-" * 60)
-    logger.info(f"Authorize URL Base: {epic_config.auth_url}")
-    logger.info(f"Token URL Base: {epic_config.token_url}")
-    logger.info("-" * 60)
-    logger.info(f"FULL AUTHORIZE URL (copy this to verify):")
-    logger.info(authorization_url)
-    logger.info("=" * 60)
+    # Build the authorize URL - static params come pre-encoded from config;
+    # only include launch token for EHR launch
+    authorization_url = epic_config.authorize_url_for(state, launch if is_ehr_launch else None)
+    
+    logger.info("Launch mode=%s state=%s...", launch_mode, state[:14])
+    
+    # Log ALL parameters for debugging (developer-facing; DEBUG only)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("=" * 60)
+        logger.debug("SMART LAUNCH INITIATED")
+        logger.debug("=" * 60)
+        logger.debug("  Launch Mode: %s", launch_mode)
+        logger.debug("  iss param: %s", iss)
+        logger.debug("  launch param: %s", launch)
+        logger.debug("-" * 60)
+        logger.debug("OAuth Parameters (VERIFY AGAINST EPIC APP REGISTRATION):")
+        logger.debug("  EPIC_ENV: %s", epic_config.env)
+        logger.debug("  client_id: %s", epic_config.client_id)
+        logger.debug("  redirect_uri (EXACT): %s", redirect_uri)
+        logger.debug("  scope: %s", epic_config.scope)
+        logger.debug("  aud: %s", aud)
+        logger.debug("  response_type: code")
+        logger.debug("  state: %s", state)
+        logger.debug("-" * 60)
+        logger.debug("Authorize URL Base: %s", epic_config.auth_url)
+        logger.debug("Token URL Base: %s", epic_config.token_url)
+        logger.debug("-" * 60)
+        logger.debug("FULL AUTHORIZE URL (copy this to verify):")
+        logger.debug(authorization_url)
+        logger.debug("=" * 60)
     
     # Set auth in progress
-    auth_progress["in_progress"] = True
-    auth_progress["started_at"] = datetime.now().timestamp()
-    auth_progress["state"] = state
+    auth_progress.in_progress = True
+    auth_progress.started_at = time.monotonic()
+    auth_progress.state = state
     
     return RedirectResponse(url=authorization_url)
 
 
-@app.get("/launch-test")
-async def launch_test():
-    """
-    Test endpoint that shows the authorize URL WITHOUT redirecting.
-    Use this to verify the exact URL being sent to Epic.
-    
-    Visit /launch-test in browser, copy the URL, and paste it directly
-    to see what Epic returns.
-    """
-    # Validate config
-    try:
-        epic_config.validate()
-    except ValueError as e:
-        raise HTTPException(status_code=500, detail=str(e))
-    
-    redirect_uri = epic_config.get_normalize_redirect_uri()
-    state = f"test_state_{datetime.now().timestamp()}"
-    
-    auth_params = {
-        "response_type": "code",
-        "client_id": epic_config.client_id,
-        "redirect_uri": redirect_uri,
-        "scope": epic_config.scope,
-        "state": state,
-        "aud": epic_config.fhir_base_url,
-    }
-    
-    from urllib.parse import urlencode
-    query = urlencode(auth_params)
-    authorization_url = f"{epic_config.auth_url}?{query}"
-    
-    html = f"""
+# Static page bodies, parsed once; request values are HTML-escaped on substitution
+_LAUNCH_TEST_HTML = string.Template("""
     <!DOCTYPE html>
     <html>
     <head><title>Launch Test - Verify OAuth URL</title></head>
@@ -274,25 +309,25 @@ async def launch_test():
         <div style="background: #f0fdf4; border: 1px solid #86efac; padding: 20px; border-radius: 8px; margin-bottom: 20px;">
             <h3>✅ Our Backend Sends This URL:</h3>
             <p style="font-size: 12px; word-break: break-all; background: #1a202c; color: #68d391; padding: 15px; border-radius: 4px; font-family: monospace;">
-                {authorization_url}
+                $authorization_url
             </p>
-            <button onclick="navigator.clipboard.writeText('{authorization_url}')" style="background: #22c55e; color: white; border: none; padding: 10px 20px; border-radius: 4px; cursor: pointer;">
+            <button onclick="navigator.clipboard.writeText('$authorization_url')" style="background: #22c55e; color: white; border: none; padding: 10px 20px; border-radius: 4px; cursor: pointer;">
                 📋 Copy URL
             </button>
-            <a href="{authorization_url}" style="display: inline-block; margin-left: 10px; background: #3b82f6; color: white; padding: 10px 20px; border-radius: 4px; text-decoration: none;">
+            <a href="$authorization_url" style="display: inline-block; margin-left: 10px; background: #3b82f6; color: white; padding: 10px 20px; border-radius: 4px; text-decoration: none;">
                 ▶️ Test URL (will redirect)
             </a>
         </div>
         
         <h3>OAuth Parameters Being Sent:</h3>
         <table style="width: 100%; border-collapse: collapse;">
-            <tr style="background: #f3f4f6;"><td style="padding: 8px; border: 1px solid #d1d5db;"><strong>authorize_url_base</strong></td><td style="padding: 8px; border: 1px solid #d1d5db; font-family: monospace;">{epic_config.auth_url}</td></tr>
-            <tr><td style="padding: 8px; border: 1px solid #d1d5db;"><strong>client_id</strong></td><td style="padding: 8px; border: 1px solid #d1d5db; font-family: monospace;">{epic_config.client_id}</td></tr>
-            <tr style="background: #f3f4f6;"><td style="padding: 8px; border: 1px solid #d1d5db;"><strong>redirect_uri</strong></td><td style="padding: 8px; border: 1px solid #d1d5db; font-family: monospace;">{redirect_uri}</td></tr>
-            <tr><td style="padding: 8px; border: 1px solid #d1d5db;"><strong>scope</strong></td><td style="padding: 8px; border: 1px solid #d1d5db; font-family: monospace;">{epic_config.scope}</td></tr>
-            <tr style="background: #f3f4f6;"><td style="padding: 8px; border: 1px solid #d1d5db;"><strong>aud</strong></td><td style="padding: 8px; border: 1px solid #d1d5db; font-family: monospace;">{epic_config.fhir_base_url}</td></tr>
+            <tr style="background: #f3f4f6;"><td style="padding: 8px; border: 1px solid #d1d5db;"><strong>authorize_url_base</strong></td><td style="padding: 8px; border: 1px solid #d1d5db; font-family: monospace;">$auth_url</td></tr>
+            <tr><td style="padding: 8px; border: 1px solid #d1d5db;"><strong>client_id</strong></td><td style="padding: 8px; border: 1px solid #d1d5db; font-family: monospace;">$client_id</td></tr>
+            <tr style="background: #f3f4f6;"><td style="padding: 8px; border: 1px solid #d1d5db;"><strong>redirect_uri</strong></td><td style="padding: 8px; border: 1px solid #d1d5db; font-family: monospace;">$redirect_uri</td></tr>
+            <tr><td style="padding: 8px; border: 1px solid #d1d5db;"><strong>scope</strong></td><td style="padding: 8px; border: 1px solid #d1d5db; font-family: monospace;">$scope</td></tr>
+            <tr style="background: #f3f4f6;"><td style="padding: 8px; border: 1px solid #d1d5db;"><strong>aud</strong></td><td style="padding: 8px; border: 1px solid #d1d5db; font-family: monospace;">$fhir_base_url</td></tr>
             <tr><td style="padding: 8px; border: 1px solid #d1d5db;"><strong>response_type</strong></td><td style="padding: 8px; border: 1px solid #d1d5db; font-family: monospace;">code</td></tr>
-            <tr style="background: #f3f4f6;"><td style="padding: 8px; border: 1px solid #d1d5db;"><strong>state</strong></td><td style="padding: 8px; border: 1px solid #d1d5db; font-family: monospace;">{state}</td></tr>
+            <tr style="background: #f3f4f6;"><td style="padding: 8px; border: 1px solid #d1d5db;"><strong>state</strong></td><td style="padding: 8px; border: 1px solid #d1d5db; font-family: monospace;">$state</td></tr>
         </table>
         
         <div style="margin-top: 20px; background: #fef3c7; border: 1px solid #fcd34d; padding: 15px; border-radius: 8px;">
@@ -317,10 +352,119 @@ async def launch_test():
         </p>
     </body>
     </html>
+    """)
+
+
+@app.get("/launch-test")
+async def launch_test():
     """
+    Test endpoint that shows the authorize URL WITHOUT redirecting.
+    Use this to verify the exact URL being sent to Epic.
+    
+    Visit /launch-test in browser, copy the URL, and paste it directly
+    to see what Epic returns.
+    """
+    # Validate config
+    try:
+        epic_config.validate()
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    redirect_uri = epic_config.get_normalize_redirect_uri()
+    state = f"test_state_{secrets.token_urlsafe(32)}"
+    # Register the state so the "Test URL" round trip passes the callback's
+    # state check, without clobbering a real launch that is still in flight
+    if not auth_progress.in_progress:
+        auth_progress.state = state
+    
+    authorization_url = epic_config.authorize_url_for(state)
+    
+    html = _LAUNCH_TEST_HTML.substitute(
+        authorization_url=escape(authorization_url),
+        auth_url=escape(epic_config.auth_url),
+        client_id=escape(epic_config.client_id),
+        redirect_uri=escape(redirect_uri),
+        scope=escape(epic_config.scope),
+        fhir_base_url=escape(epic_config.fhir_base_url),
+        state=escape(state)
+    )
     return HTMLResponse(content=html)
 
 
+_OAUTH_ERROR_HTML = string.Template("""
+        <!DOCTYPE html>
+        <html>
+        <head><title>OAuth Error</title></head>
+        <body style="font-family: sans-serif; padding: 40px; max-width: 800px; margin: auto;">
+            <h1 style="color: #dc2626;">OAuth Error</h1>
+            <div style="background: #fef2f2; border: 1px solid #fecaca; padding: 20px; border-radius: 8px;">
+                <p><strong>Error:</strong> $error</p>
+                <p><strong>Description:</strong> $error_description</p>
+            </div>
+            <h2>Debugging Steps:</h2>
+            <ol>
+                <li>Check <a href="/api/auth/diagnostics">/api/auth/diagnostics</a> for OAuth configuration</li>
+                <li>Verify client_id matches Epic App Orchard registration</li>
+                <li>Verify redirect_uri matches EXACTLY (including http vs https)</li>
+                <li>Verify Application Audience is "Patients" not "Clinicians"</li>
+                <li>Check that scopes are enabled in Epic app</li>
+            </ol>
+            <h3>Common Causes:</h3>
+            <ul>
+                <li><strong>invalid_client</strong>: Client ID not found or wrong</li>
+                <li><strong>invalid_request</strong>: Missing or invalid parameters</li>
+                <li><strong>unauthorized_client</strong>: App not authorized for these scopes</li>
+                <li><strong>access_denied</strong>: User denied authorization</li>
+            </ul>
+            <p><a href="/">← Back to Home</a> | <a href="/api/auth/diagnostics">View Diagnostics</a></p>
+        </body>
+        </html>
+        """)
+
+
+_REDACTED_TOKEN_FIELDS = frozenset(("access_token", "refresh_token"))
+
+
+def _redact_token_field(key: str, value: Any) -> str:
+    """Redacted stand-in for a token field (keeps a short access_token prefix for debugging)."""
+    if key == "access_token" and isinstance(value, str) and len(value) > 10:
+        return value[:10] + "...[REDACTED]"
+    return "[REDACTED]"
+
+
+def _decode_jwt_claims(token: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Decode the payload segment of a JWT WITHOUT verifying its signature.
+    
+    Debug/UI use only - never base an authorization decision on these claims.
+    Returns None if the token is not a decodable JWT.
+    """
+    if not token:
+        return None
+    parts = token.split(".", 2)
+    if len(parts) < 2:
+        return None
+    payload = parts[1]
+    try:
+        claims = orjson.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+    except (ValueError, orjson.JSONDecodeError) as e:
+        logger.debug("Could not decode JWT: %s", e)
+        return None
+    return claims if isinstance(claims, dict) else None
+
+
+def _session_jwt_claims(session: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Decode the session's access token claims on first use and memoize them on the session."""
+    if "jwt_claims" not in session:
+        claims = session["jwt_claims"] = _decode_jwt_claims(session.get("access_token"))
+        if claims and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("JWT Claims (decoded):")
+            for k, v in claims.items():
+                if k not in _REDACTED_TOKEN_FIELDS:  # Don't log sensitive tokens
+                    logger.debug("  %s: %s", k, v)
+    return session["jwt_claims"]
+
+
 @app.get("/callback")
 async def callback(
     code: Optional[str] = None, 
@@ -342,14 +486,15 @@ async def callback(
     - error: OAuth error code
     - error_description: Human-readable error description
     """
-    logger.info("=" * 60)
-    logger.info("OAUTH CALLBACK RECEIVED")
-    logger.info("=" * 60)
-    logger.info(f"  Callback query params:")
-    logger.info(f"    code: {code[:10] + '...' if code else '(none)'}")
-    logger.info(f"    state: {state}")
-    logger.info(f"    error: {error}")
-    logger.info(f"    error_description: {error_description}")
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("=" * 60)
+        logger.info("OAUTH CALLBACK RECEIVED")
+        logger.info("=" * 60)
+        logger.info("  Callback query params:")
+        logger.info("    code: %s", code[:10] + "..." if code else "(none)")
+        logger.info("    state: %s", state)
+        logger.info("    error: %s", error)
+        logger.info("    error_description: %s", error_description)
     
     # Check for OAuth error response
     if error:
@@ -360,78 +505,49 @@ async def callback(
         logger.error(f"  error_description: {error_description}")
         logger.error("=" * 60)
         
-        # Save to last_token_exchange for debugging
-        last_token_exchange["status_code"] = "OAUTH_ERROR"
-        last_token_exchange["scope"] = None
-        last_token_exchange["error"] = error
-        last_token_exchange["error_description"] = error_description
-        last_token_exchange["timestamp"] = datetime.now().isoformat()
-        last_token_exchange["raw_body_preview"] = f"OAuth callback error: {error} - {error_description}"
-        
-        # Clear auth in progress (OAuth error)
-        auth_progress["in_progress"] = False
-        auth_progress["state"] = None
-        auth_progress["started_at"] = None
+        # Save to last_token_exchange for debugging and clear auth in progress
+        _record_auth_failure(
+            "OAUTH_ERROR", error, error_description,
+            f"OAuth callback error: {error} - {error_description}"
+        )
         
         # Return error page for development
-        error_html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head><title>OAuth Error</title></head>
-        <body style="font-family: sans-serif; padding: 40px; max-width: 800px; margin: auto;">
-            <h1 style="color: #dc2626;">OAuth Error</h1>
-            <div style="background: #fef2f2; border: 1px solid #fecaca; padding: 20px; border-radius: 8px;">
-                <p><strong>Error:</strong> {error}</p>
-                <p><strong>Description:</strong> {error_description or 'No description provided'}</p>
-            </div>
-            <h2>Debugging Steps:</h2>
-            <ol>
-                <li>Check <a href="/api/auth/diagnostics">/api/auth/diagnostics</a> for OAuth configuration</li>
-                <li>Verify client_id matches Epic App Orchard registration</li>
-                <li>Verify redirect_uri matches EXACTLY (including http vs https)</li>
-                <li>Verify Application Audience is "Patients" not "Clinicians"</li>
-                <li>Check that scopes are enabled in Epic app</li>
-            </ol>
-            <h3>Common Causes:</h3>
-            <ul>
-                <li><strong>invalid_client</strong>: Client ID not found or wrong</li>
-                <li><strong>invalid_request</strong>: Missing or invalid parameters</li>
-                <li><strong>unauthorized_client</strong>: App not authorized for these scopes</li>
-                <li><strong>access_denied</strong>: User denied authorization</li>
-            </ul>
-            <p><a href="/">← Back to Home</a> | <a href="/api/auth/diagnostics">View Diagnostics</a></p>
-        </body>
-        </html>
-        """
+        error_html = _OAUTH_ERROR_HTML.substitute(
+            error=escape(error),
+            error_description=escape(error_description or "No description provided")
+        )
         return HTMLResponse(content=error_html, status_code=400)
     
     # Validate required params for success case
     if not code or not state:
         logger.error("Missing code or state in callback")
-        # Save to last_token_exchange for debugging
-        last_token_exchange["status_code"] = "MISSING_PARAMS"
-        last_token_exchange["scope"] = None
-        last_token_exchange["error"] = "missing_params"
-        last_token_exchange["error_description"] = f"code={bool(code)}, state={bool(state)}"
-        last_token_exchange["timestamp"] = datetime.now().isoformat()
-        last_token_exchange["raw_body_preview"] = "Callback missing required code or state parameter"
-        # Clear auth in progress (missing params)
-        auth_progress["in_progress"] = False
-        auth_progress["state"] = None
-        auth_progress["started_at"] = None
+        _record_auth_failure(
+            "MISSING_PARAMS", "missing_params", f"code={bool(code)}, state={bool(state)}",
+            "Callback missing required code or state parameter"
+        )
         raise HTTPException(status_code=400, detail="Missing code or state parameter")
     
+    # CSRF protection (RFC 6749 section 10.12): state must be the one issued by /launch.
+    # Checked before the token exchange so forged callbacks never reach Epic.
+    expected_state = auth_progress.state
+    if not expected_state or not secrets.compare_digest(state.encode(), expected_state.encode()):
+        logger.error("Callback state does not match the state issued at launch")
+        _record_auth_failure(
+            "STATE_MISMATCH", "invalid_state", "callback state does not match launch state",
+            f"got={state[:20]}"
+        )
+        raise HTTPException(status_code=400, detail="Invalid state parameter")
+    
     # Use SAME normalized redirect_uri as /launch (critical for OAuth)
     redirect_uri = epic_config.get_normalize_redirect_uri()
     
-    logger.info("Token Exchange Parameters:")
-    logger.info(f"  client_id: {epic_config.client_id}")
-    logger.info(f"  redirect_uri (EXACT): {redirect_uri}")
-    logger.info(f"  token_url: {epic_config.token_url}")
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Token Exchange Parameters:")
+        logger.info("  client_id: %s", epic_config.client_id)
+        logger.info("  redirect_uri (EXACT): %s", redirect_uri)
+        logger.info("  token_url: %s", epic_config.token_url)
     
     # Exchange code for token
-    import httpx
-    
     token_data = {
         "grant_type": "authorization_code",
         "code": code,
@@ -443,104 +559,85 @@ async def callback(
         token_data["client_secret"] = epic_config.client_secret
     
     # Log token request payload keys (not values for security)
-    logger.info(f"  Token request payload keys: {list(token_data.keys())}")
+    logger.info("  Token request payload keys: %s", list(token_data))
     
     # Set PENDING status before making request
-    last_token_exchange["status_code"] = "PENDING"
-    last_token_exchange["scope"] = None
-    last_token_exchange["error"] = None
-    last_token_exchange["error_description"] = None
-    last_token_exchange["timestamp"] = datetime.now().isoformat()
-    last_token_exchange["raw_body_preview"] = "Token exchange in progress..."
+    last_token_exchange.record("PENDING", raw_body_preview="Token exchange in progress...")
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(epic_config.token_url, data=token_data)
-            
-            # ALWAYS save raw response first
-            raw_body = response.text[:800] if response.text else "(empty)"
+        response = await get_http_client().post(epic_config.token_url, data=token_data)
+        
+        # ALWAYS save raw response first
+        raw_body = response.content[:800].decode("utf-8", errors="replace") if response.content else "(empty)"
+        if logger.isEnabledFor(logging.INFO):
             logger.info("=" * 60)
             logger.info("TOKEN EXCHANGE RESPONSE (DEV)")
             logger.info("=" * 60)
-            logger.info(f"  Status code: {response.status_code}")
-            logger.info(f"  Raw body preview: {raw_body[:200]}...")
-            
-            # Try to parse response body
-            try:
-                token_response = response.json()
-            except Exception as parse_err:
-                logger.error(f"  Failed to parse response JSON: {parse_err}")
-                logger.error(f"  Raw body: {raw_body}")
-                # ALWAYS save to last_token_exchange
-                last_token_exchange["status_code"] = response.status_code
-                last_token_exchange["scope"] = None
-                last_token_exchange["error"] = "JSON_PARSE_ERROR"
-                last_token_exchange["error_description"] = str(parse_err)
-                last_token_exchange["timestamp"] = datetime.now().isoformat()
-                last_token_exchange["raw_body_preview"] = raw_body
-                # Clear auth in progress (parse error)
-                auth_progress["in_progress"] = False
-                auth_progress["state"] = None
-                auth_progress["started_at"] = None
-                raise HTTPException(status_code=400, detail=f"Token response parse error: {parse_err}")
-            
-            # Log the response body with redacted access_token
-            redacted_body = dict(token_response)
-            if "access_token" in redacted_body:
-                at = redacted_body["access_token"]
-                redacted_body["access_token"] = at[:10] + "...[REDACTED]" if len(at) > 10 else "[REDACTED]"
-            if "refresh_token" in redacted_body:
-                redacted_body["refresh_token"] = "[REDACTED]"
-            logger.info(f"  Response body (redacted): {redacted_body}")
-            
-            # Specifically log scope field
-            response_scope = token_response.get("scope")
-            logger.info(f"  Returned 'scope' field: {response_scope}")
-            
-            # Log any error fields
-            response_error = token_response.get("error")
-            response_error_desc = token_response.get("error_description")
-            if response_error:
-                logger.error(f"  ERROR in token response: {response_error}")
-                logger.error(f"  ERROR DESCRIPTION: {response_error_desc}")
-            
-            # ALWAYS store for /api/auth/last-token endpoint
-            last_token_exchange["status_code"] = response.status_code
-            last_token_exchange["scope"] = response_scope
-            last_token_exchange["error"] = response_error
-            last_token_exchange["error_description"] = response_error_desc
-            last_token_exchange["timestamp"] = datetime.now().isoformat()
-            # Use redacted body for preview (more readable than raw)
-            last_token_exchange["raw_body_preview"] = str(redacted_body)[:800]
-            
-            logger.info(f"  Saved to last_token_exchange: status={response.status_code}, scope={response_scope}")
-            
+            logger.info("  Status code: %s", response.status_code)
+            logger.info("  Raw body preview: %s...", raw_body[:200])
+        
+        # Try to parse response body
+        try:
+            token_response = orjson.loads(response.content)
+        except Exception as parse_err:
+            logger.error(f"  Failed to parse response JSON: {parse_err}")
+            logger.error(f"  Raw body: {raw_body}")
+            # ALWAYS save to last_token_exchange
+            _record_auth_failure(response.status_code, "JSON_PARSE_ERROR", str(parse_err), raw_body)
+            raise HTTPException(status_code=400, detail=f"Token response parse error: {parse_err}")
+        
+        # Log the response body with redacted tokens (single pass, no copy-then-patch)
+        redacted_body = {
+            k: _redact_token_field(k, v) if k in _REDACTED_TOKEN_FIELDS else v
+            for k, v in token_response.items()
+        }
+        logger.info("  Response body (redacted): %s", redacted_body)
+        
+        # Specifically log scope field
+        response_scope = token_response.get("scope")
+        logger.info("  Returned 'scope' field: %s", response_scope)
+        
+        # Log any error fields
+        response_error = token_response.get("error")
+        response_error_desc = token_response.get("error_description")
+        if response_error:
+            logger.error(f"  ERROR in token response: {response_error}")
+            logger.error(f"  ERROR DESCRIPTION: {response_error_desc}")
+        
+        # ALWAYS store for /api/auth/last-token endpoint
+        # Use redacted body for preview (more readable than raw)
+        last_token_exchange.record(
+            response.status_code, response_error, response_error_desc,
+            str(redacted_body)[:800], scope=response_scope
+        )
+        
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("  Saved to last_token_exchange: status=%s, scope=%s", response.status_code, response_scope)
             logger.info("=" * 60)
-            
-            # Now check for HTTP errors
-            if response.status_code >= 400:
-                logger.error(f"Token exchange failed with status {response.status_code}")
-                # Clear auth in progress (HTTP error in token exchange)
-                auth_progress["in_progress"] = False
-                auth_progress["state"] = None
-                auth_progress["started_at"] = None
-                raise HTTPException(status_code=response.status_code, detail=f"Token exchange failed: {response_error or response.text[:200]}")
         
+        # Now check for HTTP errors
+        if response.status_code >= 400:
+            logger.error(f"Token exchange failed with status {response.status_code}")
+            # Clear auth in progress (HTTP error in token exchange)
+            auth_progress.clear()
+            raise HTTPException(status_code=response.status_code, detail=f"Token exchange failed: {response_error or raw_body[:200]}")
+    
         # Log the full token response for debugging (redact the actual token)
         granted_scope = token_response.get("scope", "")
         patient_context = token_response.get("patient")
         fhir_user = token_response.get("fhirUser")
         encounter_context = token_response.get("encounter")
         
-        logger.info("=" * 60)
-        logger.info("TOKEN RESPONSE (DEBUG)")
-        logger.info("=" * 60)
-        logger.info(f"  Granted scope: {granted_scope}")
-        logger.info(f"  Patient context: {patient_context}")
-        logger.info(f"  Encounter context: {encounter_context}")
-        logger.info(f"  fhirUser: {fhir_user}")
-        logger.info(f"  Token type: {token_response.get('token_type')}")
-        logger.info(f"  Expires in: {token_response.get('expires_in')} seconds")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("=" * 60)
+            logger.debug("TOKEN RESPONSE (DEBUG)")
+            logger.debug("=" * 60)
+            logger.debug("  Granted scope: %s", granted_scope)
+            logger.debug("  Patient context: %s", patient_context)
+            logger.debug("  Encounter context: %s", encounter_context)
+            logger.debug("  fhirUser: %s", fhir_user)
+            logger.debug("  Token type: %s", token_response.get("token_type"))
+            logger.debug("  Expires in: %s seconds", token_response.get("expires_in"))
         
         # Check if FHIR scopes were granted
         scope_parts = granted_scope.split() if granted_scope else []
@@ -552,32 +649,10 @@ async def callback(
         if not has_observation_read:
             logger.warning("WARNING: patient/Observation.read or user/Observation.read NOT in granted scopes!")
         
-        logger.info("=" * 60)
+        logger.debug("=" * 60)
         
-        # Decode JWT access token if possible (for debugging)
+        # JWT claims are debug-only; decoded lazily on first /api/auth/token-debug read
         access_token = token_response.get("access_token", "")
-        jwt_claims = None
-        if access_token and "." in access_token:
-            try:
-                import base64
-                import json as json_module
-                # JWT is base64url encoded, split by dots
-                parts = access_token.split(".")
-                if len(parts) >= 2:
-                    # Decode payload (second part)
-                    payload = parts[1]
-                    # Add padding if needed
-                    padding = 4 - len(payload) % 4
-                    if padding != 4:
-                        payload += "=" * padding
-                    decoded = base64.urlsafe_b64decode(payload)
-                    jwt_claims = json_module.loads(decoded)
-                    logger.info("JWT Claims (decoded):")
-                    for k, v in jwt_claims.items():
-                        if k not in ["access_token", "refresh_token"]:  # Don't log sensitive tokens
-                            logger.info(f"  {k}: {v}")
-            except Exception as e:
-                logger.debug(f"Could not decode JWT: {e}")
         
         # Store token in session (prototype - use secure session management in production)
         session_id = f"session_{state}"
@@ -585,12 +660,11 @@ async def callback(
             "access_token": access_token,
             "patient": patient_context,
             "fhir_base": token_response.get("fhir_base") or epic_config.fhir_base_url,
-            "expires_at": datetime.now().timestamp() + token_response.get("expires_in", 3600),
+            "expires_at": time.time() + token_response.get("expires_in", 3600),
             # Store debug info for UI
             "granted_scope": granted_scope,
             "fhir_user": fhir_user,
             "encounter": encounter_context,
-            "jwt_claims": jwt_claims,
             "scope_analysis": {
                 "has_patient_read": has_patient_read,
                 "has_observation_read": has_observation_read,
@@ -598,12 +672,10 @@ async def callback(
             }
         }
         
-        logger.info(f"Token received for patient: {patient_context}")
+        logger.info("Token received for patient: %s", patient_context)
         
         # Clear auth in progress (success)
-        auth_progress["in_progress"] = False
-        auth_progress["state"] = None
-        auth_progress["started_at"] = None
+        auth_progress.clear()
         
         # Redirect to frontend with session ID (also set cookie for seamless API calls)
         redirect_url = f"{epic_config.frontend_url}?session={session_id}&patient={token_response.get('patient')}"
@@ -613,48 +685,30 @@ async def callback(
         
         # Set cookie DIRECTLY on the response object (same as working debug endpoint)
         # CRITICAL: Must set cookie on THIS response before returning
-        logger.info("=" * 60)
-        logger.info(f"SETTING COOKIE pe_session_id={session_id[:20]}... samesite=lax secure=false")
-        logger.info("=" * 60)
-        response.set_cookie(
-            key="pe_session_id",
-            value=session_id,
-            path="/",
-            httponly=True,
-            samesite="lax",
-            secure=False
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("=" * 60)
+            logger.info("SETTING COOKIE pe_session_id=%s... samesite=lax secure=false", session_id[:20])
+            logger.info("=" * 60)
+        # Same attributes as set_cookie(path="/", httponly=True, samesite="lax", secure=False),
+        # pre-rendered: session ids are token_urlsafe output, so no cookie quoting is needed
+        response.raw_headers.append(
+            (b"set-cookie", f"{SESSION_COOKIE_NAME}={session_id}{_SESSION_COOKIE_ATTRS}".encode("latin-1"))
         )
         
-        logger.info(f"OAuth callback SUCCESS: Cookie set, redirecting to {redirect_url}")
+        logger.info("OAuth callback SUCCESS: Cookie set, redirecting to %s", redirect_url)
         return response
         
     except httpx.HTTPError as e:
         logger.error(f"Token exchange failed with HTTPError: {e}")
         # ALWAYS save to last_token_exchange
-        last_token_exchange["status_code"] = "HTTP_ERROR"
-        last_token_exchange["scope"] = None
-        last_token_exchange["error"] = "httpx_error"
-        last_token_exchange["error_description"] = str(e)
-        last_token_exchange["timestamp"] = datetime.now().isoformat()
-        last_token_exchange["raw_body_preview"] = f"HTTPError: {str(e)}"
-        # Clear auth in progress (error)
-        auth_progress["in_progress"] = False
-        auth_progress["state"] = None
-        auth_progress["started_at"] = None
+        _record_auth_failure("HTTP_ERROR", "httpx_error", str(e), f"HTTPError: {str(e)}")
         raise HTTPException(status_code=400, detail=f"Token exchange failed: {str(e)}")
     except Exception as e:
         logger.error(f"Token exchange failed with unexpected error: {e}", exc_info=True)
         # ALWAYS save to last_token_exchange
-        last_token_exchange["status_code"] = "EXCEPTION"
-        last_token_exchange["scope"] = None
-        last_token_exchange["error"] = type(e).__name__
-        last_token_exchange["error_description"] = str(e)
-        last_token_exchange["timestamp"] = datetime.now().isoformat()
-        last_token_exchange["raw_body_preview"] = f"Exception: {type(e).__name__}: {str(e)}"
-        # Clear auth in progress (error)
-        auth_progress["in_progress"] = False
-        auth_progress["state"] = None
-        auth_progress["started_at"] = None
+        _record_auth_failure(
+            "EXCEPTION", type(e).__name__, str(e), f"Exception: {type(e).__name__}: {str(e)}"
+        )
         raise HTTPException(status_code=500, detail=f"Token exchange failed: {str(e)}")
 
 
@@ -673,7 +727,7 @@ class PEAssessmentRequest(BaseModel):
 class PEAssessmentDebug(BaseModel):
     """Debug info included in assessment response."""
     patient_id: str
-    data_source: str  # "fhir" or "provided_features"
+    data_source: str  # "fhir", "fhir-cached" or "provided_features"
     fhir_calls: List[str] = []
     vitals_count: int = 0
     labs_count: int = 0
@@ -682,9 +736,16 @@ class PEAssessmentDebug(BaseModel):
     warnings: List[str] = []
 
 
+# Mapped (patient_features, feature_summary) per (session_id, patient_id), so a
+# repeat assessment skips the FHIR fetch and mapping entirely. Same lifetime as
+# the FHIR response cache underneath it; entries are treated as read-only.
+_assessment_feature_cache: TTLCache = TTLCache(
+    maxsize=1024, ttl=FHIR_RESPONSE_CACHE_TTL_SECONDS, timer=time.monotonic
+)
+
 # Critical fields for assessment
-CRITICAL_FIELDS = ["age", "triage_hr", "triage_rr", "triage_o2sat", "triage_sbp"]
-OPTIONAL_FIELDS = ["d_dimer", "triage_dbp", "triage_temp", "troponin_t", "creatinine", "bmi"]
+CRITICAL_FIELDS = ("age", "triage_hr", "triage_rr", "triage_o2sat", "triage_sbp")
+OPTIONAL_FIELDS = ("d_dimer", "triage_dbp", "triage_temp", "troponin_t", "creatinine", "bmi")
 
 
 @app.post("/api/pe-assessment")
@@ -727,44 +788,53 @@ async def pe_assessment(request: PEAssessmentRequest):
             # Fetch from FHIR
             session = get_session_or_error(request.session_id)
             
-            # Initialize FHIR client
-            fhir_client = FHIRClient(
-                base_url=session["fhir_base"],
-                access_token=session["access_token"]
-            )
-            
-            # Record FHIR calls for debug
-            debug_info["fhir_calls"].append(f"GET Patient/{request.patient_id}")
-            debug_info["fhir_calls"].append(f"GET Observation?patient={request.patient_id}&_count=200&_sort=-date")
-            
-            # Fetch and map FHIR data
-            logger.info("Fetching patient data from FHIR...")
-            patient_features, feature_summary = await map_fhir_to_features(
-                fhir_client, 
-                request.patient_id
-            )
+            cache_key = (request.session_id, request.patient_id)
+            cached = _assessment_feature_cache.get(cache_key)
+            if cached is not None:
+                logger.info("Using cached FHIR features")
+                patient_features, feature_summary = cached
+                debug_info["data_source"] = "fhir-cached"
+                debug_info["cache"] = "hit"
+            else:
+                # Initialize FHIR client
+                fhir_client = FHIRClient(
+                    base_url=session["fhir_base"],
+                    access_token=session["access_token"]
+                )
+                
+                # Record FHIR calls for debug
+                debug_info["fhir_calls"].append(f"GET Patient/{request.patient_id}")
+                debug_info["fhir_calls"].append(
+                    f"GET Observation?patient={request.patient_id}&_count=200&_sort=-date&code={FEATURE_LOINC_CODES}"
+                )
+                
+                # Fetch and map FHIR data
+                logger.info("Fetching patient data from FHIR...")
+                patient_features, feature_summary = await map_fhir_to_features(
+                    fhir_client, 
+                    request.patient_id
+                )
+                _assessment_feature_cache[cache_key] = (patient_features, feature_summary)
+                debug_info["cache"] = "miss"
             
             # Count vitals and labs for debug
             if isinstance(feature_summary, dict):
                 vitals = feature_summary.get("vital_signs", {})
                 labs = feature_summary.get("laboratory", {})
-                debug_info["vitals_count"] = sum(1 for v in vitals.values() if v and v != "Not available")
-                debug_info["labs_count"] = sum(1 for v in labs.values() if v and v != "Not available")
+                debug_info["vitals_count"] = sum(1 for v in vitals.values() if v and v != NOT_AVAILABLE)
+                debug_info["labs_count"] = sum(1 for v in labs.values() if v and v != NOT_AVAILABLE)
         
-        # Analyze missing fields
-        for field in CRITICAL_FIELDS:
-            if patient_features.get(field) is None:
-                debug_info["missing_critical"].append(field)
-        
-        for field in OPTIONAL_FIELDS:
-            if patient_features.get(field) is None:
-                debug_info["missing_optional"].append(field)
+        # Analyze missing fields (field order preserved for the debug payload)
+        feature_get = patient_features.get
+        debug_info["missing_critical"] = [f for f in CRITICAL_FIELDS if feature_get(f) is None]
+        debug_info["missing_optional"] = [f for f in OPTIONAL_FIELDS if feature_get(f) is None]
         
         # Add warnings for common issues
-        if not patient_features.get("d_dimer"):
-            debug_info["warnings"].append("D-dimer not found in FHIR data")
-        if not patient_features.get("triage_o2sat"):
-            debug_info["warnings"].append("SpO2 not found - critical for PE assessment")
+        warnings = debug_info["warnings"]
+        if not feature_get("d_dimer"):
+            warnings.append("D-dimer not found in FHIR data")
+        if not feature_get("triage_o2sat"):
+            warnings.append("SpO2 not found - critical for PE assessment")
         
         # Run prediction
         logger.info("Running PE prediction...")
@@ -802,17 +872,18 @@ async def pe_assessment(request: PEAssessmentRequest):
             "debug": debug_info
         }
         
-        return JSONResponse(content=response)
+        return ORJSONResponse(content=response)
         
     except HTTPException:
         raise
     except Exception as e:
         # Structured error logging
         logger.error(
-            f"=== ASSESSMENT FAILED ===\n"
-            f"  patient_id: {request.patient_id}\n"
-            f"  error: {str(e)}\n"
-            f"  traceback: {traceback.format_exc()}"
+            "=== ASSESSMENT FAILED ===\n"
+            "  patient_id: %s\n"
+            "  error: %s",
+            request.patient_id, e,
+            exc_info=True
         )
         debug_info["warnings"].append(f"Assessment failed: {str(e)}")
         raise HTTPException(
@@ -826,6 +897,7 @@ async def pe_assessment(request: PEAssessmentRequest):
 # ============================================================================
 
 SESSION_COOKIE_NAME = "pe_session_id"
+_SESSION_COOKIE_ATTRS = "; HttpOnly; Path=/; SameSite=lax"
 
 
 def set_session_cookie(response, session_id: str):
@@ -891,23 +963,14 @@ async def get_active_session(request: Request) -> Dict[str, Any]:
         if auth_header.startswith("Bearer "):
             effective_session_id = auth_header[7:]
     
-    if not effective_session_id or effective_session_id not in sessions:
+    # Expired sessions are evicted by the store, so a hit is always live
+    session = _lookup_session(effective_session_id)
+    if session is None:
         debug_info = get_cookie_debug_info(request)
         raise HTTPException(
             status_code=401,
             detail={
-                "message": "Not authenticated. Please connect to Epic.",
-                "cookie_debug": debug_info
-            }
-        )
-    
-    session = sessions[effective_session_id]
-    if datetime.now().timestamp() > session["expires_at"]:
-        debug_info = get_cookie_debug_info(request)
-        raise HTTPException(
-            status_code=401, 
-            detail={
-                "message": "Session expired. Please reconnect to Epic.",
+                "message": "Not authenticated (or session expired). Please connect to Epic.",
                 "cookie_debug": debug_info
             }
         )
@@ -941,16 +1004,13 @@ def get_session_from_request(request: Request, session_id: Optional[str] = None)
         if auth_header.startswith("Bearer "):
             effective_session_id = auth_header[7:]
     
-    if not effective_session_id or effective_session_id not in sessions:
+    session = _lookup_session(effective_session_id)
+    if session is None:
         raise HTTPException(
             status_code=401,
-            detail="Not authenticated. Please connect to Epic."
+            detail="Not authenticated (or session expired). Please connect to Epic."
         )
     
-    session = sessions[effective_session_id]
-    if datetime.now().timestamp() > session["expires_at"]:
-        raise HTTPException(status_code=401, detail="Session expired. Please reconnect to Epic.")
-    
     return session, effective_session_id
 
 
@@ -959,17 +1019,46 @@ def get_session_or_error(session_id: Optional[str]) -> Dict[str, Any]:
     Legacy function for backward compatibility.
     Prefer get_active_session dependency for new code.
     """
-    if not session_id or session_id not in sessions:
+    session = _lookup_session(session_id)
+    if session is None:
         raise HTTPException(
             status_code=401,
-            detail="Not authenticated. Please connect to Epic."
+            detail="Not authenticated (or session expired). Please connect to Epic."
         )
-    session = sessions[session_id]
-    if datetime.now().timestamp() > session["expires_at"]:
-        raise HTTPException(status_code=401, detail="Session expired. Please reconnect to Epic.")
     return session
 
 
+# Only the Patient elements _simplify_patient reads (the server drops address,
+# telecom, identifier, ...); gzip is already negotiated by httpx by default
+PATIENT_SUMMARY_ELEMENTS = "id,name,birthDate,gender"
+
+
+def _simplify_patient(resource: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a FHIR Patient to the id/name/birthDate/gender the frontend shows."""
+    names = resource.get("name")
+    name = "Unknown"
+    if names:
+        name_obj = names[0]
+        given = " ".join(name_obj.get("given", ()))
+        name = f"{given} {name_obj.get('family', '')}".strip() or "Unknown"
+    
+    return {
+        "id": resource.get("id"),
+        "name": name,
+        "birthDate": resource.get("birthDate"),
+        "gender": resource.get("gender")
+    }
+
+
+def _simplify_patient_bundle(bundle: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Simplify every Patient entry of a searchset Bundle (other resource types are skipped)."""
+    return [
+        _simplify_patient(resource)
+        for resource in (entry.get("resource") or {} for entry in bundle.get("entry") or ())
+        if resource.get("resourceType") == "Patient"
+    ]
+
+
 @app.get("/api/fhir/patients")
 async def list_patients(
     count: int = 20,
@@ -987,46 +1076,25 @@ async def list_patients(
     logger.info(f"Listing patients (count={count}) for session {effective_session_id[:20]}...")
     
     try:
-        import httpx
-        
         url = f"{session['fhir_base']}/Patient"
-        params = {"_count": min(count, 50)}  # Cap at 50 for safety
+        params = {"_count": min(count, 50), "_elements": PATIENT_SUMMARY_ELEMENTS}  # Cap at 50 for safety
         headers = {
             "Authorization": f"Bearer {session['access_token']}",
             "Accept": "application/fhir+json"
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers, params=params, timeout=15.0)
-            
-            if response.status_code == 401:
-                raise HTTPException(status_code=401, detail="Token expired or invalid. Please re-authenticate.")
-            if response.status_code == 403:
-                raise HTTPException(status_code=403, detail="Forbidden: token lacks required scope. Check granted scopes in /api/auth/last-token.")
-            
-            response.raise_for_status()
-            bundle = response.json()
+        response = await get_http_client().get(url, headers=headers, params=params, timeout=15.0)
+        
+        if response.status_code == 401:
+            raise HTTPException(status_code=401, detail="Token expired or invalid. Please re-authenticate.")
+        if response.status_code == 403:
+            raise HTTPException(status_code=403, detail="Forbidden: token lacks required scope. Check granted scopes in /api/auth/last-token.")
+        
+        response.raise_for_status()
+        bundle = orjson.loads(response.content)
         
         # Extract and simplify patient data
-        patients = []
-        if bundle.get("entry"):
-            for entry in bundle["entry"]:
-                resource = entry.get("resource", {})
-                if resource.get("resourceType") == "Patient":
-                    # Extract name
-                    name = "Unknown"
-                    if resource.get("name"):
-                        name_obj = resource["name"][0]
-                        given = " ".join(name_obj.get("given", []))
-                        family = name_obj.get("family", "")
-                        name = f"{given} {family}".strip() or "Unknown"
-                    
-                    patients.append({
-                        "id": resource.get("id"),
-                        "name": name,
-                        "birthDate": resource.get("birthDate"),
-                        "gender": resource.get("gender")
-                    })
+        patients = _simplify_patient_bundle(bundle)
         
         logger.info(f"Found {len(patients)} patients")
         return {
@@ -1067,48 +1135,29 @@ async def get_patient_samples(
     }
     
     try:
-        import httpx
         url = f"{session['fhir_base']}/Patient"
-        params = {"_count": 10}
+        params = {"_count": 10, "_elements": PATIENT_SUMMARY_ELEMENTS}
         headers = {
             "Authorization": f"Bearer {session['access_token']}",
             "Accept": "application/fhir+json"
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, headers=headers, params=params, timeout=10.0)
-            
-            if response.status_code == 403:
-                logger.warning("Patient search blocked by Epic (403 Forbidden)")
-                result["search_blocked"] = True
-                result["message"] = "Epic sandbox may block patient search. Use a known test Patient ID (e.g., erXuFYUfucBZaryVksYEcMg3)."
-                return result
-            
-            if response.status_code == 401:
-                raise HTTPException(status_code=401, detail="Token expired. Please re-authenticate.")
-            
-            response.raise_for_status()
-            bundle = response.json()
+        response = await get_http_client().get(url, headers=headers, params=params, timeout=10.0)
+        
+        if response.status_code == 403:
+            logger.warning("Patient search blocked by Epic (403 Forbidden)")
+            result["search_blocked"] = True
+            result["message"] = "Epic sandbox may block patient search. Use a known test Patient ID (e.g., erXuFYUfucBZaryVksYEcMg3)."
+            return result
+        
+        if response.status_code == 401:
+            raise HTTPException(status_code=401, detail="Token expired. Please re-authenticate.")
+        
+        response.raise_for_status()
+        bundle = orjson.loads(response.content)
         
         # Extract patient samples
-        if bundle.get("entry"):
-            for entry in bundle["entry"]:
-                resource = entry.get("resource", {})
-                if resource.get("resourceType") == "Patient":
-                    # Extract name
-                    name = "Unknown"
-                    if resource.get("name"):
-                        name_obj = resource["name"][0]
-                        given = " ".join(name_obj.get("given", []))
-                        family = name_obj.get("family", "")
-                        name = f"{given} {family}".strip() or "Unknown"
-                    
-                    result["samples"].append({
-                        "id": resource.get("id"),
-                        "name": name,
-                        "gender": resource.get("gender"),
-                        "birthDate": resource.get("birthDate")
-                    })
+        result["samples"] = _simplify_patient_bundle(bundle)
         
         if not result["samples"]:
             result["message"] = "No patients returned from search. Use a known test Patient ID."
@@ -1148,26 +1197,49 @@ async def get_patient(
         patient = await fhir_client.get_patient(patient_id)
         
         # Simplify for frontend
-        name = "Unknown"
-        if patient.get("name"):
-            name_obj = patient["name"][0]
-            given = " ".join(name_obj.get("given", []))
-            family = name_obj.get("family", "")
-            name = f"{given} {family}".strip() or "Unknown"
-        
-        return {
-            "id": patient.get("id"),
-            "name": name,
-            "birthDate": patient.get("birthDate"),
-            "gender": patient.get("gender"),
-            "fhir_url": f"{session['fhir_base']}/Patient/{patient_id}"
-        }
+        simplified = _simplify_patient(patient)
+        simplified["fhir_url"] = f"{session['fhir_base']}/Patient/{patient_id}"
+        return simplified
         
     except Exception as e:
         logger.error(f"Get patient failed: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get patient: {str(e)}")
 
 
+async def _fetch_observation_category(
+    fhir_client: FHIRClient,
+    fhir_base: str,
+    patient_id: str,
+    category: str,
+    result_key: str,
+    label: str,
+    empty_warning: str
+) -> Tuple[str, List[Dict], List[str], str, Optional[Dict[str, Any]]]:
+    """
+    Fetch and normalize one observation category for /api/fhir/observations.
+    
+    Returns (result_key, normalized, warnings, fhir_call, scope_error); errors are
+    reported through warnings/fhir_call instead of raised.
+    """
+    url = f"{fhir_base}/Observation?patient={patient_id}&category={category}&_count=100&_sort=-date"
+    try:
+        observations = await fhir_client.get_observations(patient_id, category=category, max_results=100)
+    except FHIRScopeError as e:
+        logger.warning(f"{label} fetch failed (403): {e.message}")
+        scope_error = {
+            "failed_url": e.failed_url,
+            "message": e.message,
+            "response_body": e.response_body[:200] if e.response_body else None
+        }
+        return result_key, [], [f"403 Forbidden: {e.message}"], f"{url} → 403 FORBIDDEN", scope_error
+    except Exception as e:
+        logger.warning(f"{label} fetch failed: {e}")
+        return result_key, [], [f"{label} fetch failed: {str(e)}"], f"{url} → ERROR", None
+    
+    warnings = [] if observations else [empty_warning]
+    return result_key, _normalize_observations(observations, category), warnings, url, None
+
+
 @app.get("/api/fhir/observations")
 async def get_observations(
     patient_id: str,
@@ -1205,49 +1277,27 @@ async def get_observations(
     result["debug"]["granted_scope"] = session.get("granted_scope", "(unknown)")
     
     try:
+        # Vitals and labs are independent searches - run them concurrently.
+        # Each fetch handles its own errors, so one failing never cancels the other.
+        fetches = []
         if vitals:
-            vital_url = f"{session['fhir_base']}/Observation?patient={patient_id}&category=vital-signs&_count=100&_sort=-date"
-            try:
-                vital_obs = await fhir_client.get_observations(patient_id, category="vital-signs", max_results=100)
-                result["vitals"] = _normalize_observations(vital_obs, "vital-signs")
-                result["debug"]["fhir_calls"].append(vital_url)
-                if not vital_obs:
-                    result["debug"]["warnings"].append("No vital-signs returned for this patient")
-            except FHIRScopeError as e:
-                logger.warning(f"Vitals fetch failed (403): {e.message}")
-                result["debug"]["warnings"].append(f"403 Forbidden: {e.message}")
-                result["debug"]["fhir_calls"].append(f"{vital_url} → 403 FORBIDDEN")
-                result["debug"]["scope_error"] = {
-                    "failed_url": e.failed_url,
-                    "message": e.message,
-                    "response_body": e.response_body[:200] if e.response_body else None
-                }
-            except Exception as e:
-                logger.warning(f"Vitals fetch failed: {e}")
-                result["debug"]["warnings"].append(f"Vitals fetch failed: {str(e)}")
-                result["debug"]["fhir_calls"].append(f"{vital_url} → ERROR")
-        
+            fetches.append(_fetch_observation_category(
+                fhir_client, session["fhir_base"], patient_id,
+                "vital-signs", "vitals", "Vitals", "No vital-signs returned for this patient"
+            ))
         if labs:
-            lab_url = f"{session['fhir_base']}/Observation?patient={patient_id}&category=laboratory&_count=100&_sort=-date"
-            try:
-                lab_obs = await fhir_client.get_observations(patient_id, category="laboratory", max_results=100)
-                result["labs"] = _normalize_observations(lab_obs, "laboratory")
-                result["debug"]["fhir_calls"].append(lab_url)
-                if not lab_obs:
-                    result["debug"]["warnings"].append("No laboratory results returned for this patient")
-            except FHIRScopeError as e:
-                logger.warning(f"Labs fetch failed (403): {e.message}")
-                result["debug"]["warnings"].append(f"403 Forbidden: {e.message}")
-                result["debug"]["fhir_calls"].append(f"{lab_url} → 403 FORBIDDEN")
-                result["debug"]["scope_error"] = {
-                    "failed_url": e.failed_url,
-                    "message": e.message,
-                    "response_body": e.response_body[:200] if e.response_body else None
-                }
-            except Exception as e:
-                logger.warning(f"Labs fetch failed: {e}")
-                result["debug"]["warnings"].append(f"Labs fetch failed: {str(e)}")
-                result["debug"]["fhir_calls"].append(f"{lab_url} → ERROR")
+            fetches.append(_fetch_observation_category(
+                fhir_client, session["fhir_base"], patient_id,
+                "laboratory", "labs", "Labs", "No laboratory results returned for this patient"
+            ))
+        
+        # Merge in request order (vitals first) so debug output matches the sequential version
+        for key, normalized, warnings, fhir_call, scope_error in await asyncio.gather(*fetches):
+            result[key] = normalized
+            result["debug"]["fhir_calls"].append(fhir_call)
+            result["debug"]["warnings"].extend(warnings)
+            if scope_error is not None:
+                result["debug"]["scope_error"] = scope_error
         
         logger.info(f"Fetched {len(result['vitals'])} vitals, {len(result['labs'])} labs")
         return result
@@ -1273,33 +1323,37 @@ async def get_observations(
 def _normalize_observations(observations: List[Dict], category: str) -> List[Dict]:
     """Normalize FHIR observations for frontend display."""
     normalized = []
+    append = normalized.append
     for obs in observations:
         try:
-            # Extract code/display
-            code_info = obs.get("code", {})
-            codings = code_info.get("coding", [])
-            loinc_code = None
-            display_name = code_info.get("text", "Unknown")
+            obs_get = obs.get
             
-            for coding in codings:
-                if coding.get("system") == "http://loinc.org":
-                    loinc_code = coding.get("code")
-                    display_name = coding.get("display", display_name)
-                    break
+            # Extract code/display (first LOINC coding wins)
+            code_info = obs_get("code") or {}
+            display_name = code_info.get("text", "Unknown")
+            loinc_coding = next(
+                (c for c in code_info.get("coding", ()) if c.get("system") == LOINC_SYSTEM),
+                None
+            )
+            if loinc_coding is None:
+                loinc_code = None
+            else:
+                loinc_code = loinc_coding.get("code")
+                display_name = loinc_coding.get("display", display_name)
             
-            # Extract value
-            value = None
-            unit = ""
-            if "valueQuantity" in obs:
-                value = obs["valueQuantity"].get("value")
-                unit = obs["valueQuantity"].get("unit", "")
-            elif "valueString" in obs:
-                value = obs["valueString"]
+            # Extract value (one lookup each instead of membership test + index)
+            value_quantity = obs_get("valueQuantity")
+            if value_quantity is not None:
+                value = value_quantity.get("value")
+                unit = value_quantity.get("unit", "")
+            else:
+                value = obs_get("valueString")
+                unit = ""
             
             # Extract date
-            effective_date = obs.get("effectiveDateTime", obs.get("issued"))
+            effective_date = obs_get("effectiveDateTime", obs_get("issued"))
             
-            normalized.append({
+            append({
                 "code": loinc_code,
                 "display": display_name,
                 "value": value,
@@ -1331,20 +1385,20 @@ async def health_check():
 @app.get("/api/session/info")
 async def get_session_info(session_id: str):
     """Get session info for debugging (no sensitive data)."""
-    if session_id not in sessions:
+    session = _lookup_session(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    session = sessions[session_id]
-    expires_at = datetime.fromtimestamp(session["expires_at"])
-    is_expired = datetime.now().timestamp() > session["expires_at"]
+    expires_at = session["expires_at"]
+    time_remaining = expires_at - time.time()
     
     return {
         "session_id": session_id[:20] + "...",
         "patient": session.get("patient"),
         "fhir_base": session.get("fhir_base"),
-        "expires_at": expires_at.isoformat(),
-        "is_expired": is_expired,
-        "time_remaining_seconds": max(0, session["expires_at"] - datetime.now().timestamp())
+        "expires_at": datetime.fromtimestamp(expires_at).isoformat(),
+        "is_expired": time_remaining < 0,
+        "time_remaining_seconds": max(0, time_remaining)
     }
 
 
@@ -1370,7 +1424,8 @@ async def get_auth_status(request: Request, session_id: Optional[str] = None):
     effective_session_id = session_id or request.cookies.get(SESSION_COOKIE_NAME)
     
     # Check if session exists and is valid
-    if not effective_session_id or effective_session_id not in sessions:
+    session = _lookup_session(effective_session_id)
+    if session is None:
         return {
             "authenticated": False,
             "expiresAt": None,
@@ -1381,21 +1436,8 @@ async def get_auth_status(request: Request, session_id: Optional[str] = None):
             "sessionSource": "none"
         }
     
-    session = sessions[effective_session_id]
-    now = datetime.now().timestamp()
-    is_expired = now > session["expires_at"]
-    time_remaining = max(0, session["expires_at"] - now)
-    
-    if is_expired:
-        return {
-            "authenticated": False,
-            "expiresAt": datetime.fromtimestamp(session["expires_at"]).isoformat(),
-            "patient": session.get("patient"),
-            "fhirBase": session.get("fhir_base"),
-            "sandboxMode": SANDBOX_MODE,
-            "timeRemaining": 0,
-            "reason": "token_expired"
-        }
+    # Expired sessions are evicted by the store, so a hit is always live
+    time_remaining = max(0, session["expires_at"] - time.time())
     
     return {
         "authenticated": True,
@@ -1421,7 +1463,8 @@ async def get_token_debug(request: Request, session_id: Optional[str] = None):
     # Try to get session from multiple sources
     effective_session_id = session_id or request.cookies.get(SESSION_COOKIE_NAME)
     
-    if not effective_session_id or effective_session_id not in sessions:
+    session = _lookup_session(effective_session_id)
+    if session is None:
         return {
             "error": "No valid session",
             "hasSession": False,
@@ -1429,7 +1472,6 @@ async def get_token_debug(request: Request, session_id: Optional[str] = None):
             "cookie_present": bool(request.cookies.get(SESSION_COOKIE_NAME))
         }
     
-    session = sessions[effective_session_id]
     
     # Redact the actual access token
     access_token = session.get("access_token", "")
@@ -1443,7 +1485,7 @@ async def get_token_debug(request: Request, session_id: Optional[str] = None):
         "patientContext": session.get("patient"),
         "encounterContext": session.get("encounter"),
         "fhirUser": session.get("fhir_user"),
-        "jwtClaims": session.get("jwt_claims"),
+        "jwtClaims": _session_jwt_claims(session),
         "fhirBase": session.get("fhir_base"),
         "expiresAt": datetime.fromtimestamp(session.get("expires_at", 0)).isoformat() if session.get("expires_at") else None
     }
@@ -1457,7 +1499,7 @@ async def get_last_token_exchange():
     Returns status code, scope, and any error from the most recent
     POST to Epic's token endpoint. Useful for debugging OAuth failures.
     """
-    granted_scope = last_token_exchange.get("scope") or ""
+    granted_scope = last_token_exchange.scope or ""
     requested_scope = epic_config.scope
     
     # Analyze scope differences
@@ -1466,16 +1508,16 @@ async def get_last_token_exchange():
     missing_scopes = list(requested_parts - granted_parts)
     
     return {
-        "last_token_status": last_token_exchange.get("status_code"),
+        "last_token_status": last_token_exchange.status_code,
         "requested_scope": requested_scope,
         "granted_scope": granted_scope,
         "missing_scopes": missing_scopes,
         "has_patient_read": "user/Patient.read" in granted_parts or "patient/Patient.read" in granted_parts,
         "has_observation_read": "user/Observation.read" in granted_parts or "patient/Observation.read" in granted_parts,
-        "last_token_error": last_token_exchange.get("error"),
-        "last_token_error_description": last_token_exchange.get("error_description"),
-        "timestamp": last_token_exchange.get("timestamp"),
-        "raw_body_preview": last_token_exchange.get("raw_body_preview")
+        "last_token_error": last_token_exchange.error,
+        "last_token_error_description": last_token_exchange.error_description,
+        "timestamp": last_token_exchange.timestamp,
+        "raw_body_preview": last_token_exchange.raw_body_preview
     }
 
 
@@ -1491,21 +1533,22 @@ async def get_auth_progress():
     
     Useful for debugging "auth already in progress" issues.
     """
-    in_progress = auth_progress["in_progress"]
-    started_at = auth_progress["started_at"]
+    in_progress = auth_progress.in_progress
+    started_at = auth_progress.started_at
     
     age_seconds = None
     started_at_iso = None
     
-    if started_at:
-        age_seconds = int(datetime.now().timestamp() - started_at)
-        started_at_iso = datetime.fromtimestamp(started_at).isoformat()
+    if started_at is not None:
+        age = time.monotonic() - started_at
+        age_seconds = int(age)
+        started_at_iso = datetime.fromtimestamp(time.time() - age).isoformat()
     
     return {
         "auth_in_progress": in_progress,
         "auth_started_at": started_at_iso,
         "age_seconds": age_seconds,
-        "state": auth_progress["state"][:20] + "..." if auth_progress["state"] else None,
+        "state": auth_progress.state[:20] + "..." if auth_progress.state else None,
         "stale": age_seconds is not None and age_seconds > 180
     }
 
@@ -1521,17 +1564,10 @@ async def reset_auth():
     logger.info("Auth reset requested")
     
     # Clear auth in progress
-    auth_progress["in_progress"] = False
-    auth_progress["state"] = None
-    auth_progress["started_at"] = None
+    auth_progress.clear()
     
     # Clear last token exchange info
-    last_token_exchange["status_code"] = None
-    last_token_exchange["scope"] = None
-    last_token_exchange["error"] = None
-    last_token_exchange["error_description"] = None
-    last_token_exchange["timestamp"] = None
-    last_token_exchange["raw_body_preview"] = None
+    last_token_exchange.clear()
     
     logger.info("Auth state cleared")
     
@@ -1558,7 +1594,7 @@ async def debug_set_cookie():
     TEMPORARY: Test endpoint to verify cookie setting works.
     Sets a test cookie with same attributes as OAuth callback.
     """
-    response = JSONResponse(content={"ok": True, "message": "Cookie set: pe_session_id=debug_cookie_test"})
+    response = ORJSONResponse(content={"ok": True, "message": "Cookie set: pe_session_id=debug_cookie_test"})
     logger.info("SETTING COOKIE pe_session_id=debug_cookie_test samesite=lax secure=false")
     response.set_cookie(
         key="pe_session_id",
@@ -1576,7 +1612,7 @@ async def debug_clear_cookie():
     """
     TEMPORARY: Clear pe_session_id cookie for clean retesting.
     """
-    response = JSONResponse(content={"ok": True, "message": "Cookie cleared: pe_session_id"})
+    response = ORJSONResponse(content={"ok": True, "message": "Cookie cleared: pe_session_id"})
     response.delete_cookie(key="pe_session_id", path="/")
     logger.info("CLEARED COOKIE pe_session_id")
     return response
@@ -1593,7 +1629,8 @@ from integration.clinical_api import (
     get_vitals_trend,
     get_ddimer_trend,
     get_imaging_studies,
-    get_clinical_summary
+    get_clinical_summary,
+    get_clinical_bundle
 )
 
 DEBUG_MODE = os.getenv("DEBUG", "false").lower() == "true"
@@ -1760,6 +1797,28 @@ async def api_clinical_summary(
     )
 
 
+@app.get("/api/clinical/bundle")
+async def api_clinical_bundle(
+    patient_id: str,
+    session: Dict[str, Any] = Depends(get_active_session)
+):
+    """
+    Get all clinical sections in a single call.
+    
+    Returns:
+    - anticoagulation, diagnoses, vitals, inr, ddimer, imaging
+    """
+    if not patient_id:
+        raise HTTPException(status_code=400, detail="patient_id is required")
+    
+    return await get_clinical_bundle(
+        fhir_base=session["fhir_base"],
+        access_token=session["access_token"],
+        patient_id=patient_id,
+        debug=DEBUG_MODE
+    )
+
+
 @app.get("/api/clinical/data-availability")
 async def api_data_availability(
     patient_id: str,
@@ -2194,7 +2253,8 @@ async def get_auth_diagnostics(request: Request):
     
     This endpoint does NOT require authentication.
     """
-    diagnostics = epic_config.get_diagnostics()
+    # Config diagnostics are a shared read-only mapping - copy before extending
+    diagnostics = dict(epic_config.get_diagnostics())
     
     # Add session info
     session_cookie = request.cookies.get(SESSION_COOKIE_NAME)
@@ -2245,6 +2305,15 @@ async def root():
 
 
 if __name__ == "__main__":
+    import sys
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="info")
+    # uvloop + httptools (uvicorn[standard]); uvloop has no Windows support
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        log_level="info",
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools"
+    )
 
@@ -41,5 +41,7 @@ echo ""
 echo "Press Ctrl+C to stop"
 echo ""
 
-uvicorn main:app --reload --port 8000
+# uvloop + httptools (installed with uvicorn[standard]) for lower per-await
+# overhead on the concurrent FHIR fan-outs and faster request parsing
+uvicorn main:app --reload --port 8000 --loop uvloop --http httptools
 
@@ -121,6 +121,29 @@ class TestOAuthEndpoints:
         
         # Should respond (even if with error)
         assert response.status_code in [200, 302, 400, 500]
+    
+    def test_callback_rejects_unissued_state(self, client):
+        """Test that /callback refuses a state /launch never issued, before any token exchange"""
+        client.post("/api/auth/reset")
+        response = client.get("/callback?code=dummy&state=forged_state")
+        
+        assert response.status_code == 400
+        last = client.get("/api/auth/last-token").json()
+        assert last["last_token_status"] == "STATE_MISMATCH"
+    
+    def test_diagnostics_cannot_be_mutated(self, client):
+        """Test that shared config diagnostics stay read-only, nested mappings included"""
+        from config import epic_config
+        
+        diagnostics = epic_config.get_diagnostics()
+        with pytest.raises(TypeError):
+            diagnostics["authorize_params"]["aud"] = "https://attacker.example.com"
+        with pytest.raises(TypeError):
+            diagnostics["assertions"]["no_mychart_urls"] = False
+        
+        response = client.get("/api/auth/diagnostics")
+        assert response.status_code == 200
+        assert response.json()["authorize_params"]["aud"] == epic_config.fhir_base_url
 
 
 if __name__ == "__main__":
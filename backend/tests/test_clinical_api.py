@@ -0,0 +1,338 @@
+"""
+Tests for clinical API FHIR helpers
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import orjson
+import pytest
+
+from integration import clinical_api
+from integration.clinical_api import (
+    FHIRSession,
+    fhir_search_iter,
+    get_anticoagulation_status,
+    get_inr_trend,
+    _empty_vital_series,
+    _parse_vital_observations,
+    _merge_vital_series,
+    _downsample_indices,
+    FHIR_MAX_PAGES,
+    MAX_ACTIVE_MEDS_PER_TYPE
+)
+
+FHIR_BASE = "https://fhir.example.org/R4"
+
+
+def _bundle(resources, next_url=None):
+    """Build a searchset Bundle page, optionally linking to a next page."""
+    bundle = {
+        "resourceType": "Bundle",
+        "entry": [{"resource": r} for r in resources]
+    }
+    if next_url:
+        bundle["link"] = [{"relation": "next", "url": next_url}]
+    return bundle
+
+
+def _stub_client(pages, requested):
+    """
+    AsyncClient serving pages[i] for the i-th request and recording the URLs.
+    """
+    def handler(request):
+        requested.append(str(request.url))
+        return httpx.Response(200, content=orjson.dumps(pages[len(requested) - 1]))
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def _session(client):
+    return FHIRSession(base=FHIR_BASE, headers={"Authorization": "Bearer t"}, client=client)
+
+
+def _collect(session, params=None, **kwargs):
+    async def run():
+        return [r async for r in fhir_search_iter(session, "Observation", params or {}, **kwargs)]
+    return asyncio.run(run())
+
+
+class TestFHIRSearchPaging:
+    """Test Bundle.link[next] handling in fhir_search_iter"""
+
+    def test_follows_next_links(self):
+        """Test that every page linked via next is read in order"""
+        pages = [
+            _bundle([{"id": "1"}], f"{FHIR_BASE}/Observation?page=2"),
+            _bundle([{"id": "2"}], f"{FHIR_BASE}/Observation?page=3"),
+            _bundle([{"id": "3"}])
+        ]
+        requested = []
+
+        resources = _collect(_session(_stub_client(pages, requested)), {"patient": "p1"})
+
+        assert [r["id"] for r in resources] == ["1", "2", "3"]
+        assert requested[0] == f"{FHIR_BASE}/Observation?patient=p1"
+        assert requested[1:] == [f"{FHIR_BASE}/Observation?page=2", f"{FHIR_BASE}/Observation?page=3"]
+
+    def test_stops_at_max_pages(self):
+        """Test that paging stops at the page cap even if next links continue"""
+        pages = [
+            _bundle([{"id": str(i)}], f"{FHIR_BASE}/Observation?page={i + 1}")
+            for i in range(FHIR_MAX_PAGES + 5)
+        ]
+        requested = []
+
+        resources = _collect(_session(_stub_client(pages, requested)))
+
+        assert len(requested) == FHIR_MAX_PAGES
+        assert len(resources) == FHIR_MAX_PAGES
+
+        requested.clear()
+        _collect(_session(_stub_client(pages, requested)), max_pages=2)
+        assert len(requested) == 2
+
+    def test_refuses_foreign_host_next_link(self):
+        """Test that a next link outside the FHIR base is not followed"""
+        pages = [
+            _bundle([{"id": "1"}], "https://attacker.example.com/Observation?page=2"),
+            _bundle([{"id": "2"}])
+        ]
+        requested = []
+
+        resources = _collect(_session(_stub_client(pages, requested)))
+
+        assert [r["id"] for r in resources] == ["1"]
+        assert len(requested) == 1
+
+    def test_refuses_lookalike_host_next_link(self):
+        """Test that a host merely prefixed by the FHIR base is not followed"""
+        pages = [
+            _bundle([{"id": "1"}], "https://fhir.example.org/R4.attacker.com/Observation"),
+            _bundle([{"id": "2"}])
+        ]
+        requested = []
+
+        _collect(_session(_stub_client(pages, requested)))
+
+        assert len(requested) == 1
+
+
+def _med_request(name, status="active"):
+    return {
+        "resourceType": "MedicationRequest",
+        "medicationCodeableConcept": {"text": name},
+        "status": status,
+        "authoredOn": "2026-01-01"
+    }
+
+
+class TestAnticoagulationEarlyStop:
+    """Test early termination of MedicationRequest paging"""
+
+    @pytest.fixture(autouse=True)
+    def stub_client(self, monkeypatch):
+        self.pages = []
+        self.requested = []
+        monkeypatch.setattr(
+            clinical_api, "get_http_client",
+            lambda: _stub_client(self.pages, self.requested)
+        )
+        clinical_api.clear_cache()
+        yield
+        clinical_api.clear_cache()
+
+    def test_warfarin_past_doac_cutoff_is_found(self):
+        """Test that many active DOACs on page 1 don't hide warfarin on page 2"""
+        self.pages[:] = [
+            _bundle(
+                [_med_request("Apixaban 5 MG Tablet")] * (MAX_ACTIVE_MEDS_PER_TYPE + 2),
+                f"{FHIR_BASE}/MedicationRequest?page=2"
+            ),
+            _bundle([_med_request("Warfarin 5 MG Tablet"), _med_request("Aspirin 81 MG Tablet")])
+        ]
+
+        result = asyncio.run(get_anticoagulation_status(FHIR_BASE, "t", "p1"))
+
+        assert len(self.requested) == 2
+        assert result["status"] == "on_anticoagulant"
+        assert result["has_warfarin"] is True
+        assert any(m["type"] == "Antiplatelet" for m in result["medications"])
+
+    def test_stops_once_every_type_has_enough(self):
+        """Test that paging stops once each anticoagulant type hits the cutoff"""
+        names = ["Apixaban 5 MG Tablet", "Warfarin 5 MG Tablet", "Enoxaparin 40 MG/0.4ML"]
+        self.pages[:] = [
+            _bundle(
+                [_med_request(n) for n in names] * MAX_ACTIVE_MEDS_PER_TYPE,
+                f"{FHIR_BASE}/MedicationRequest?page=2"
+            ),
+            _bundle([_med_request("Rivaroxaban 20 MG Tablet")])
+        ]
+
+        result = asyncio.run(get_anticoagulation_status(FHIR_BASE, "t", "p2"))
+
+        assert len(self.requested) == 1
+        assert len(result["medications"]) == len(names) * MAX_ACTIVE_MEDS_PER_TYPE
+        assert result["has_warfarin"] is True
+
+
+class TestLabTrendSearch:
+    """Test the shared INR / D-dimer laboratory search"""
+
+    @pytest.fixture(autouse=True)
+    def stub_client(self, monkeypatch):
+        self.requested = []
+        self.coded = True
+
+        def handler(request):
+            self.requested.append(request.url)
+            has_code = "code" in request.url.params
+            inr = {
+                "effectiveDateTime": "2026-10-01T08:00:00Z",
+                "valueQuantity": {"value": 2.4, "unit": "{INR}"},
+                "code": {"text": "INR", "coding": [{"code": "6301-6"}] if self.coded else []}
+            }
+            entries = [inr] if has_code == self.coded else []
+            return httpx.Response(200, content=orjson.dumps(_bundle(entries)))
+
+        monkeypatch.setattr(
+            clinical_api, "get_http_client",
+            lambda: httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        )
+        clinical_api.clear_cache()
+        yield
+        clinical_api.clear_cache()
+
+    def test_coded_server_uses_code_filter(self):
+        """Test that LOINC-coded labs come from the code-filtered search"""
+        result = asyncio.run(get_inr_trend(FHIR_BASE, "t", "p1"))
+
+        assert [p["value"] for p in result["series"]] == [2.4]
+        coded = [url for url in self.requested if "code" in url.params]
+        assert len(coded) == 1 and "6301-6" in coded[0].params["code"]
+
+    def test_uncoded_server_matches_by_text(self):
+        """Test that servers without LOINC coding fall back to code text"""
+        self.coded = False
+
+        result = asyncio.run(get_inr_trend(FHIR_BASE, "t", "p2"))
+
+        assert [p["value"] for p in result["series"]] == [2.4]
+        assert len(self.requested) == 2
+
+
+def _spo2(obs_id, time_str, value):
+    return {
+        "id": obs_id,
+        "effectiveDateTime": time_str,
+        "code": {"text": "SpO2", "coding": [{"code": "59408-5"}]},
+        "valueQuantity": {"value": value, "unit": "%"}
+    }
+
+
+def _vital_series(observations):
+    series = _empty_vital_series()
+    _parse_vital_observations(observations, series)
+    return series
+
+
+class TestVitalDeltaMerge:
+    """Test merging _lastUpdated delta fetches into the cached vitals"""
+
+    WINDOW_START = datetime(2026, 10, 15, 0, 0, tzinfo=timezone.utc)
+
+    def test_delta_replaces_points_by_observation_id(self):
+        """Test that an Observation returned again replaces its old point"""
+        base = _vital_series([
+            _spo2("a", "2026-10-15T10:00:00Z", 97),
+            _spo2("b", "2026-10-15T09:00:00Z", 96)
+        ])
+        delta = _vital_series([
+            _spo2("c", "2026-10-15T11:00:00Z", 94),
+            _spo2("b", "2026-10-15T09:00:00Z", 99)
+        ])
+
+        merged = _merge_vital_series(base, delta, self.WINDOW_START)["spo2"]
+
+        assert merged["id"] == ["c", "a", "b"]
+        assert merged["value"] == [94, 97, 99]
+
+    def test_keeps_distinct_observations_at_same_time(self):
+        """Test that device and manual readings with one timestamp both survive"""
+        base = _vital_series([
+            _spo2("device", "2026-10-15T10:00:00Z", 97),
+            _spo2("manual", "2026-10-15T10:00:00Z", 95)
+        ])
+        delta = _vital_series([_spo2("new", "2026-10-15T10:00:00Z", 93)])
+
+        merged = _merge_vital_series(base, delta, self.WINDOW_START)["spo2"]
+
+        assert sorted(merged["id"]) == ["device", "manual", "new"]
+        assert merged["time"] == ["2026-10-15T10:00:00Z"] * 3
+
+    def test_trims_window_by_instant_not_string(self):
+        """Test that UTC offsets are honoured when dropping old points"""
+        window_start = datetime(2026, 10, 15, 10, 0, tzinfo=timezone.utc)
+        base = _vital_series([
+            # 09:30Z - before the window despite the later-looking string
+            _spo2("offset_out", "2026-10-15T11:30:00+02:00", 96),
+            # 10:30Z - inside the window despite the earlier-looking string
+            _spo2("offset_in", "2026-10-15T06:30:00-04:00", 97),
+            _spo2("utc_out", "2026-10-15T09:59:00Z", 95)
+        ])
+
+        merged = _merge_vital_series(base, _empty_vital_series(), window_start)["spo2"]
+
+        assert merged["id"] == ["offset_in"]
+
+
+def _minutely(count, start=datetime(2026, 10, 15, 12, 0)):
+    """count timestamps one minute apart, newest first."""
+    return [(start - timedelta(minutes=i)).isoformat() for i in range(count)]
+
+
+class TestVitalDownsampling:
+    """Test time-bucket downsampling of vital series"""
+
+    def test_short_series_untouched(self):
+        """Test that series within max_points keep every point"""
+        times = _minutely(50)
+        assert list(_downsample_indices(times, 200)) == list(range(50))
+
+    def test_just_over_limit_keeps_max_points(self):
+        """Test that a dense series slightly over the limit still fills the budget"""
+        indices = _downsample_indices(_minutely(500), 200)
+
+        assert len(indices) == 200
+        assert indices == sorted(indices)
+
+    def test_bursts_collapse_to_newest_point(self):
+        """Test one point per bucket, keeping the newest reading of a burst"""
+        times = [
+            "2026-10-15T10:00:02", "2026-10-15T10:00:01", "2026-10-15T10:00:00",
+            "2026-10-15T09:00:00",
+            "2026-10-15T08:00:00",
+            "2026-10-15T07:00:02", "2026-10-15T07:00:01", "2026-10-15T07:00:00"
+        ]
+
+        assert _downsample_indices(times, 4) == [0, 3, 4, 5]
+
+    def test_long_window_thinned_evenly(self):
+        """Test that more than max_points 10-minute buckets are thinned across the range"""
+        times = _minutely(7 * 24 * 60)
+
+        indices = _downsample_indices(times, 200)
+
+        assert len(indices) == 200
+        assert indices[0] == 0
+        assert indices[-1] >= len(times) - 10
+        gaps = [b - a for a, b in zip(indices, indices[1:])]
+        assert max(gaps) - min(gaps) <= 10
+
+    def test_unparseable_timestamps_use_stride(self):
+        """Test that unparseable timestamps fall back to every Nth point"""
+        times = ["not-a-date"] * 10
+
+        assert list(_downsample_indices(times, 3)) == [0, 3, 6]
@@ -7,7 +7,8 @@ from integration.fhir_mapping import (
     extract_observation_value,
     extract_gender,
     extract_age,
-    find_observation_by_loinc
+    find_observation_by_loinc,
+    extract_loinc_features
 )
 
 
@@ -187,6 +188,22 @@ class TestLOINCMapping:
         observations = []
         value = find_observation_by_loinc(observations, ["8867-4"])
         assert value is None
+    
+    def test_extract_loinc_features_matches_linear_lookup(self):
+        """Test that the single-pass extraction returns the most recent match across codes"""
+        def spo2(code, value):
+            return {
+                "code": {"coding": [{"system": "http://loinc.org", "code": code}]},
+                "valueQuantity": {"value": value} if value is not None else {}
+            }
+        
+        # Most recent first, as returned by _sort=-date
+        observations = [spo2("59408-5", None), spo2("2708-6", 95), spo2("59408-5", 98)]
+        
+        values = extract_loinc_features(observations)
+        assert values["triage_o2sat"] == 95
+        assert values["triage_o2sat"] == find_observation_by_loinc(observations, ["59408-5", "2708-6"])
+        assert "triage_hr" not in values
 
 
 class TestMissingValueHandling: